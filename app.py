@@ -1,10 +1,14 @@
 # app.py
+import io
 import json
 import base64
+import threading
+import time
 import streamlit as st
 
-from logic.parse_documents import parse_documents
-from logic.tax_2024 import compute_tax_summary
+from logic.parse_documents import iter_parse_documents
+from logic.tax_2024 import compute_tax_summary_cents, income_cents_from_summary
+from logic.money import cents_dict_to_dollars
 from logic.map_parsed_to_form1040 import map_parsed_to_form1040   # ✅ use mapper
 from logic.generate_form1040 import generate_form_1040             # ✅ coordinate overlay
 
@@ -41,32 +45,112 @@ uploaded = st.file_uploader(
     "Upload one or more tax PDFs", type=["pdf"], accept_multiple_files=True
 )
 
+# ------------------------------------------------------------
+# Background parsing: documents are parsed in a worker thread and
+# results stream into the page as each one finishes.
+# ------------------------------------------------------------
+def _upload_key(files):
+    return tuple((f.name, f.size, getattr(f, "file_id", "")) for f in files)
+
+
+def _start_parse_job(files):
+    # Copy the uploads so the worker never touches Streamlit objects.
+    copies = []
+    for f in files:
+        buf = io.BytesIO(f.getvalue())
+        buf.name = f.name
+        copies.append(buf)
+
+    job = {
+        "key": _upload_key(files),
+        "cancel": threading.Event(),
+        "total": len(copies),
+        "completed": 0,
+        "result": None,
+        "error": None,
+        "done": False,
+    }
+
+    def work():
+        try:
+            for event in iter_parse_documents(copies, cancel=job["cancel"]):
+                job["result"] = event["result"]
+                job["completed"] = event["index"] + 1
+        except Exception as e:
+            job["error"] = e
+        finally:
+            job["done"] = True
+
+    threading.Thread(target=work, daemon=True).start()
+    return job
+
+
+EMPTY_PARSE = {"documents": {}, "document_list": [], "duplicates": [], "summary": {"income": {}, "withholding": {}}}
+
 # ------------------------------------------------------------
 # Processing Logic
 # ------------------------------------------------------------
 if uploaded:
-    # Step 1 – Parse uploaded documents
-    parsed = parse_documents(uploaded)
+    # Step 1 – Parse uploaded documents (cancel stale work when uploads change)
+    job = st.session_state.get("parse_job")
+    if job is None or job["key"] != _upload_key(uploaded):
+        if job is not None:
+            job["cancel"].set()
+        job = st.session_state.parse_job = _start_parse_job(uploaded)
+
+    parsed = job["result"] or EMPTY_PARSE
     st.subheader("Parsed Documents")
-    st.json(parsed["documents"], expanded=False)
+    if not job["done"]:
+        st.progress(
+            job["completed"] / max(1, job["total"]),
+            text=f"Parsed {job['completed']} of {job['total']} document(s)…",
+        )
+    # every uploaded form ("documents" only keeps the latest of each type)
+    doc_list = parsed.get("document_list", list(parsed["documents"].values()))
+    st.json(doc_list, expanded=False)
+    for dup in parsed.get("duplicates", []):
+        st.info(f"⏭️ Skipped {dup['filename']}: {dup['kind']} duplicate of {dup['duplicate_of']}")
+    for dup in parsed.get("possible_duplicates", []):
+        st.warning(f"🔍 {dup['filename']} looks like {dup['duplicate_of']}; both were parsed, check it is not a duplicate")
+    for fail in parsed.get("failed", []):
+        st.error(f"⛔ {fail['filename']} was not parsed: {fail['error']}")
+    for doc in doc_list:
+        if doc.get("budget", {}).get("status") == "partial":
+            st.warning(
+                f"⏱️ {doc['filename']}: extraction stopped early "
+                f"({', '.join(doc['budget']['exceeded'])} limit reached). Some fields may be missing."
+            )
+        if doc.get("needs_review"):
+            st.warning(
+                f"⚠️ {doc['filename']}: extracted W-2 amounts failed consistency checks "
+                f"(confidence {doc.get('confidence', 0.0):.2f}). Please verify before filing."
+            )
+
+    if not job["done"]:
+        # Running totals while the rest of the batch is still parsing
+        inc = parsed["summary"]["income"]
+        col1, col2, col3 = st.columns(3)
+        col1.metric("W-2 Wages (so far)", f"${inc.get('w2_wages', 0.0):.2f}")
+        col2.metric("Interest (so far)", f"${inc.get('int_interest', 0.0):.2f}")
+        col3.metric("NEC (so far)", f"${inc.get('nec_nonemployee_comp', 0.0):.2f}")
+        time.sleep(0.5)
+        st.rerun()
+
+    if job["error"] is not None:
+        st.error(f"❌ Error parsing documents: {job['error']}")
+        st.stop()
 
     # Step 2 – Map parsed fields directly to 1040 lines
     form_fields = map_parsed_to_form1040(parsed)
 
-    # Step 3 – Compute totals from parsed data
-    s = parsed.get("summary", {"income": {}, "withholding": {}})
-    income_components = {
-        "w2_wages": float(s["income"].get("w2_wages", 0.0)),
-        "interest": float(s["income"].get("int_interest", 0.0)),
-        "nec": float(s["income"].get("nec_nonemployee_comp", 0.0)),
-    }
-    total_withholding = float(s["withholding"].get("federal", 0.0))
-
-    calc = compute_tax_summary(
-        income_components=income_components,
-        total_withholding=total_withholding,
+    # Step 3 – Compute totals from parsed data (integer cents end to end)
+    s = parsed.get("summary_cents", {"income": {}, "withholding": {}})
+    calc_cents = compute_tax_summary_cents(
+        income_cents=income_cents_from_summary(s),
+        withholding_cents=s["withholding"].get("federal", 0),
         filing_status=filing_status,
     )
+    calc = cents_dict_to_dollars(calc_cents)
 
     # Step 4 – Show summary metrics
     st.subheader("Tax Summary (2024)")
@@ -82,9 +166,10 @@ if uploaded:
     # Step 5 – Merge parsed + calculated + identity info
     form_fields.update(calc)
     form_fields["filing_status"] = filing_status
-    form_fields["taxpayer_name"] = form_fields.get("taxpayer_name") or taxpayer_name
-    form_fields["taxpayer_ssn"] = form_fields.get("taxpayer_ssn") or ssn
-    form_fields["address_line"] = form_fields.get("address_line") or address
+    # the preparer's sidebar entries win over values read from the W-2
+    form_fields["taxpayer_name"] = taxpayer_name or form_fields.get("taxpayer_name", "")
+    form_fields["taxpayer_ssn"] = ssn or form_fields.get("taxpayer_ssn", "")
+    form_fields["address_line"] = address or form_fields.get("address_line", "")
 
     # Step 6 – Generate & Download Form 1040 PDF
     try:
@@ -119,4 +204,7 @@ if uploaded:
         st.error(f"❌ Error generating Form 1040: {e}")
 
 else:
+    job = st.session_state.pop("parse_job", None)
+    if job is not None:
+        job["cancel"].set()
     st.info("📤 Upload at least one PDF to begin.")
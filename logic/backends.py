@@ -0,0 +1,154 @@
+# logic/backends.py
+#
+# Registry of optional extraction / rendering backends, imported lazily.
+#
+# Nothing heavy (pdfplumber, PyMuPDF, PIL, pytesseract, ReportLab) is imported
+# at module load anywhere in logic/. Call sites ask this module for a backend
+# the first time they need it; the import happens once, is timed, and is cached.
+#
+# Deployments choose which extractors / renderers may be used with
+#   TAXRETURN_BACKENDS=pymupdf,ocr,reportlab
+# (unset or empty → every installed backend is enabled).
+import importlib
+import importlib.util
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+ENV_VAR = "TAXRETURN_BACKENDS"
+
+# backend name → kind and the modules it needs, in import order
+BACKENDS: Dict[str, Dict[str, Any]] = {
+    "pymupdf": {"kind": "extract", "modules": ("fitz",)},
+    "pdfplumber": {"kind": "extract", "modules": ("pdfplumber",)},
+    "ocr": {"kind": "extract", "modules": ("fitz", "PIL.Image", "pytesseract")},
+    "reportlab": {
+        "kind": "render",
+        "modules": ("reportlab.pdfgen.canvas", "reportlab.lib.pagesizes", "reportlab.lib.utils"),
+    },
+    "pypdf": {"kind": "render", "modules": ("pypdf",)},
+}
+
+
+class BackendUnavailable(ImportError):
+    """Raised when a backend is disabled for this deployment or not installed."""
+
+
+_lock = threading.Lock()
+_modules: Dict[str, Any] = {}
+_import_seconds: Dict[str, float] = {}
+_available: Dict[str, bool] = {}
+
+
+# ---------------------------
+# Discovery / configuration
+# ---------------------------
+def _module_installed(name: str) -> bool:
+    # Checks the top-level package only, so nothing gets imported.
+    top = name.split(".", 1)[0]
+    try:
+        return importlib.util.find_spec(top) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def is_available(backend: str) -> bool:
+    """True if every module the backend needs is installed (without importing it)."""
+    if backend not in _available:
+        _available[backend] = all(_module_installed(m) for m in BACKENDS[backend]["modules"])
+    return _available[backend]
+
+
+def configured_backends() -> Optional[List[str]]:
+    """Backends named in TAXRETURN_BACKENDS, or None when unrestricted."""
+    raw = os.environ.get(ENV_VAR, "").strip()
+    if not raw:
+        return None
+    names = [n.strip().lower() for n in raw.split(",") if n.strip()]
+    unknown = [n for n in names if n not in BACKENDS]
+    if unknown:
+        raise ValueError(f"{ENV_VAR} names unknown backend(s): {', '.join(unknown)}")
+    return names
+
+
+def is_enabled(backend: str) -> bool:
+    configured = configured_backends()
+    if configured is not None and backend not in configured:
+        return False
+    return is_available(backend)
+
+
+def enabled_backends(kind: Optional[str] = None) -> List[str]:
+    return [
+        name for name, spec in BACKENDS.items()
+        if (kind is None or spec["kind"] == kind) and is_enabled(name)
+    ]
+
+
+# ---------------------------
+# Lazy import
+# ---------------------------
+def module(name: str):
+    """Import `name` on first use (timed) and return the cached module afterwards."""
+    mod = _modules.get(name)
+    if mod is not None:
+        return mod
+    with _lock:
+        mod = _modules.get(name)
+        if mod is None:
+            t0 = time.perf_counter()
+            mod = importlib.import_module(name)
+            _import_seconds[name] = time.perf_counter() - t0
+            _modules[name] = mod
+    return mod
+
+
+def require(backend: str) -> Tuple[Any, ...]:
+    """
+    Return the backend's modules (in BACKENDS order), importing them on first use.
+    Raises BackendUnavailable if the backend is disabled or not installed.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend}")
+    if not is_enabled(backend):
+        state = "not installed" if not is_available(backend) else f"disabled by {ENV_VAR}"
+        raise BackendUnavailable(f"Backend '{backend}' is {state}")
+    return tuple(module(m) for m in BACKENDS[backend]["modules"])
+
+
+def import_costs() -> Dict[str, float]:
+    """Seconds spent importing each module loaded so far in this process."""
+    return dict(_import_seconds)
+
+
+def backend_report() -> Dict[str, Dict[str, Any]]:
+    report = {}
+    for name, spec in BACKENDS.items():
+        loaded = all(m in _modules for m in spec["modules"])
+        report[name] = {
+            "kind": spec["kind"],
+            "available": is_available(name),
+            "enabled": is_enabled(name),
+            "loaded": loaded,
+            "import_seconds": round(sum(_import_seconds.get(m, 0.0) for m in spec["modules"]), 4)
+            if loaded else None,
+        }
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Show backend availability and import cost.")
+    parser.add_argument("--load", action="store_true", help="Import every enabled backend and time it")
+    args = parser.parse_args()
+
+    if args.load:
+        for name in enabled_backends():
+            try:
+                require(name)
+            except ImportError as e:
+                print(f"{name}: {e}")
+    print(json.dumps(backend_report(), indent=2))
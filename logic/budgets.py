@@ -0,0 +1,335 @@
+# logic/budgets.py
+#
+# Per-document resource budgets, so one pathological PDF (huge pages at
+# 450 dpi, hundreds of pages, a hung Tesseract) cannot stall a batch.
+#
+#   wall_seconds    total time for one document
+#   max_pages       pages extracted per document; later pages are skipped
+#   max_megapixels  total pixels rendered for OCR
+#   ocr_seconds     total Tesseract time (passed to pytesseract as `timeout`)
+#
+# Limits are enforced cooperatively inside extraction (the document is then
+# marked "partial"). For a hard guarantee, IsolatedParser runs documents in a
+# persistent worker subprocess that is killed and restarted when a document
+# overruns its wall time (the document is then marked "failed").
+#
+# Deployments set limits with
+#   TAXRETURN_BUDGET=wall_seconds=60,max_pages=20,max_megapixels=500,ocr_seconds=30
+# (unset names keep their defaults; 0 means unlimited).
+import os
+import pickle
+import queue
+import struct
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ENV_VAR = "TAXRETURN_BUDGET"
+
+DEFAULT_BUDGET: Dict[str, float] = {
+    "wall_seconds": 120.0,
+    "max_pages": 50,
+    "max_megapixels": 1000.0,
+    "ocr_seconds": 90.0,
+}
+
+# extra time the worker subprocess gets past wall_seconds before it is killed
+KILL_GRACE_SECONDS = 5.0
+
+
+def load_budget(overrides: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+    """DEFAULT_BUDGET, updated from TAXRETURN_BUDGET and then from `overrides`."""
+    budget = dict(DEFAULT_BUDGET)
+    raw = os.environ.get(ENV_VAR, "").strip()
+    if raw:
+        for item in raw.split(","):
+            if not item.strip():
+                continue
+            name, _, value = item.partition("=")
+            name = name.strip().lower()
+            if name not in DEFAULT_BUDGET:
+                raise ValueError(f"{ENV_VAR} names unknown limit: {name}")
+            try:
+                budget[name] = float(value)
+            except ValueError:
+                raise ValueError(f"{ENV_VAR}: {name} must be a number, got {value!r}") from None
+    for name, value in (overrides or {}).items():
+        if name not in DEFAULT_BUDGET:
+            raise ValueError(f"Unknown budget limit: {name}")
+        budget[name] = value
+    return budget
+
+
+class DocumentBudget:
+    """
+    Tracks one document's spending against its limits.
+
+    Extraction code asks before it spends (allow_page, allow_pixels,
+    ocr_timeout) and stops or falls back when the answer is no; every limit
+    that bit is recorded in `exceeded`.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, float]] = None):
+        self.limits = load_budget(limits)
+        self.started = time.monotonic()
+        self.pages = 0
+        self.megapixels = 0.0
+        self.ocr_seconds = 0.0
+        self.exceeded: List[str] = []
+
+    def _limit(self, name: str) -> Optional[float]:
+        value = self.limits.get(name)
+        return value if value else None
+
+    def _exceed(self, name: str) -> None:
+        if name not in self.exceeded:
+            self.exceeded.append(name)
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining_wall(self) -> Optional[float]:
+        limit = self._limit("wall_seconds")
+        return None if limit is None else limit - self.elapsed()
+
+    def expired(self) -> bool:
+        remaining = self.remaining_wall()
+        if remaining is not None and remaining <= 0:
+            self._exceed("wall_seconds")
+            return True
+        return False
+
+    def allow_page(self) -> bool:
+        """Count one more extracted page; False once max_pages is used up or time is out."""
+        if self.expired():
+            return False
+        limit = self._limit("max_pages")
+        if limit is not None and self.pages >= limit:
+            self._exceed("max_pages")
+            return False
+        self.pages += 1
+        return True
+
+    def allow_pixels(self, width: float, height: float) -> bool:
+        """Reserve a render of width × height pixels; False if it would exceed max_megapixels."""
+        mp = width * height / 1e6
+        limit = self._limit("max_megapixels")
+        if limit is not None and self.megapixels + mp > limit:
+            self._exceed("max_megapixels")
+            return False
+        self.megapixels += mp
+        return True
+
+    def ocr_timeout(self) -> Optional[float]:
+        """
+        Seconds the next Tesseract call may take (the smaller of the OCR and
+        wall-time budgets left), None when unlimited, 0 when nothing is left.
+        """
+        limits = []
+        ocr_limit = self._limit("ocr_seconds")
+        if ocr_limit is not None:
+            limits.append(ocr_limit - self.ocr_seconds)
+        wall = self.remaining_wall()
+        if wall is not None:
+            limits.append(wall)
+        if not limits:
+            return None
+        left = min(limits)
+        if left <= 0:
+            self._exceed("ocr_seconds" if ocr_limit is not None and self.ocr_seconds >= ocr_limit else "wall_seconds")
+            return 0.0
+        return left
+
+    def charge_ocr(self, seconds: float) -> None:
+        self.ocr_seconds += seconds
+        ocr_limit = self._limit("ocr_seconds")
+        if ocr_limit is not None and self.ocr_seconds >= ocr_limit:
+            self._exceed("ocr_seconds")
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "status": "partial" if self.exceeded else "ok",
+            "exceeded": list(self.exceeded),
+            "elapsed_seconds": round(self.elapsed(), 3),
+            "pages": self.pages,
+            "megapixels": round(self.megapixels, 2),
+            "ocr_seconds": round(self.ocr_seconds, 3),
+        }
+
+
+# ---------------------------
+# Worker subprocess
+#
+# Frames on stdin / stdout are a 4-byte big-endian length followed by a pickle.
+# A plain subprocess (not multiprocessing) so job_store's pool workers, which
+# are daemonic, can still start one.
+# ---------------------------
+_HEADER = struct.Struct(">I")
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def _write_frame(stream, obj) -> None:
+    payload = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    stream.write(_HEADER.pack(len(payload)))
+    stream.write(payload)
+    stream.flush()
+
+
+def _read_frame(stream):
+    header = stream.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        raise EOFError("worker pipe closed")
+    (size,) = _HEADER.unpack(header)
+    payload = stream.read(size)
+    if len(payload) < size:
+        raise EOFError("worker pipe closed")
+    return pickle.loads(payload)
+
+
+class DocumentFailed(RuntimeError):
+    """A document was cancelled (worker killed) or crashed its worker."""
+
+
+class IsolatedParser:
+    """
+    Parses documents one at a time in a long-lived worker subprocess.
+
+        with IsolatedParser() as worker:
+            parsed = worker.parse(data, filename, skip_pages, limits)   # _parse_one() result
+            prints = worker.fingerprints(data, limits)                   # dedup.page_fingerprints()
+
+    The worker is started lazily and reused, so the PDF / OCR import cost is
+    paid once. If a document runs past wall_seconds + KILL_GRACE_SECONDS the
+    worker is killed, DocumentFailed is raised, and the next document gets a
+    fresh worker.
+    """
+
+    def __init__(self):
+        self._proc: Optional[subprocess.Popen] = None
+        self._responses: "queue.Queue[Any]" = queue.Queue()
+        self._lock = threading.Lock()
+        self.restarts = 0
+
+    def _start(self) -> None:
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(REPO_ROOT), env.get("PYTHONPATH")]))
+        self._proc = subprocess.Popen(
+            [sys.executable, "-m", "logic.budgets", "--serve"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            cwd=str(REPO_ROOT),
+            env=env,
+        )
+        self._responses = queue.Queue()
+        threading.Thread(target=self._pump, args=(self._proc, self._responses), daemon=True).start()
+
+    @staticmethod
+    def _pump(proc: subprocess.Popen, responses: "queue.Queue[Any]") -> None:
+        try:
+            while True:
+                responses.put(_read_frame(proc.stdout))
+        except (EOFError, OSError, ValueError, pickle.UnpicklingError):
+            responses.put(EOFError("worker exited"))
+
+    def _kill(self) -> None:
+        if self._proc is not None:
+            self._proc.kill()
+            self._proc.wait()
+            self._proc = None
+
+    def parse(self, data: bytes, filename: str, skip_pages=None, limits: Optional[Dict[str, float]] = None):
+        limits = load_budget(limits)
+        return self._call(("parse", data, filename, skip_pages, limits), limits)
+
+    def fingerprints(self, data: bytes, limits: Optional[Dict[str, float]] = None):
+        """dedup.page_fingerprints() under the document's budget, in the worker."""
+        limits = load_budget(limits)
+        return self._call(("fingerprint", data, limits), limits)
+
+    def _call(self, request: tuple, limits: Dict[str, float]):
+        wall = limits.get("wall_seconds")
+        deadline = wall + KILL_GRACE_SECONDS if wall else None
+        with self._lock:
+            if self._proc is None or self._proc.poll() is not None:
+                self._start()
+            try:
+                _write_frame(self._proc.stdin, request)
+                response = self._responses.get(timeout=deadline)
+            except queue.Empty:
+                self._kill()
+                self.restarts += 1
+                raise DocumentFailed(f"cancelled after {deadline:.0f}s (wall_seconds={wall:g})") from None
+            except (BrokenPipeError, OSError) as e:
+                self._kill()
+                raise DocumentFailed(f"worker unavailable: {e}") from None
+            if isinstance(response, EOFError):
+                self._kill()
+                self.restarts += 1
+                raise DocumentFailed("worker exited while parsing")
+        status, value = response
+        if status == "error":
+            raise DocumentFailed(value)
+        return value
+
+    def close(self) -> None:
+        with self._lock:
+            if self._proc is not None:
+                try:
+                    self._proc.stdin.close()
+                    self._proc.wait(timeout=2)
+                except Exception:
+                    self._kill()
+                self._proc = None
+
+    def __enter__(self) -> "IsolatedParser":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def serve() -> None:
+    """
+    Worker loop: read ("parse", data, filename, skip_pages, limits) or
+    ("fingerprint", data, limits), reply ("ok", result) or ("error", msg).
+    """
+    from logic.dedup import page_fingerprints
+    from logic.parse_documents import _parse_one
+
+    # Keep stray prints from libraries off the framed protocol stream.
+    out = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    inp = sys.stdin.buffer
+
+    while True:
+        try:
+            request = _read_frame(inp)
+        except EOFError:
+            return
+        try:
+            if request[0] == "fingerprint":
+                _, data, limits = request
+                result = ("ok", page_fingerprints(data, DocumentBudget(limits)))
+            else:
+                _, data, filename, skip_pages, limits = request
+                result = ("ok", _parse_one(data, filename, skip_pages, DocumentBudget(limits)))
+        except Exception as e:
+            result = ("error", f"{type(e).__name__}: {e}")
+        _write_frame(out, result)
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Per-document budget settings / worker.")
+    parser.add_argument("--serve", action="store_true", help="Run as a parse worker on stdin/stdout")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve()
+    else:
+        print(json.dumps(load_budget(), indent=2))
@@ -1,49 +1,175 @@
+import hashlib
+import io
+import json
+
 import streamlit as st
 from PIL import Image
-import json
 from streamlit_image_coordinates import streamlit_image_coordinates
 
+PAGE_POINTS = (612.0, 792.0)   # US Letter in PDF points (ReportLab's coordinate space)
+DISPLAY_WIDTH = 850            # width the page / tile is sent to the browser at
+TILE_COLS, TILE_ROWS = 2, 3    # zoom grid; a 2550×3300 scan gives 1275×1100 px tiles
+
+
+# ---------------------------
+# Coordinate mapping
+# ---------------------------
+def display_to_full(click, view, display_size):
+    """
+    Map a click on the displayed (downscaled) view to full-resolution pixels.
+    `view` is the (left, top, right, bottom) box of the full image being shown.
+    Clicks land on whole display pixels, so the pixel centre is used.
+    """
+    left, top, right, bottom = view
+    dw, dh = display_size
+    fx = left + (click["x"] + 0.5) * (right - left) / dw
+    fy = top + (click["y"] + 0.5) * (bottom - top) / dh
+    return fx, fy
+
+
+def full_to_points(fx, fy, full_size):
+    """Full-resolution pixels (top-left origin) → PDF points (bottom-left origin)."""
+    width, height = full_size
+    pw, ph = PAGE_POINTS
+    return round(fx * pw / width, 2), round(ph - fy * ph / height, 2)
+
+
+def tile_boxes(full_size):
+    width, height = full_size
+    boxes = {}
+    for r in range(TILE_ROWS):
+        for c in range(TILE_COLS):
+            boxes[f"Row {r + 1}, col {c + 1}"] = (
+                width * c // TILE_COLS,
+                height * r // TILE_ROWS,
+                width * (c + 1) // TILE_COLS,
+                height * (r + 1) // TILE_ROWS,
+            )
+    return boxes
+
+
+# ---------------------------
+# Cached images (decoded and downscaled once per upload)
+# ---------------------------
+@st.cache_data(show_spinner="Preparing page…", max_entries=8)
+def load_views(digest, _data):
+    """
+    Decode the page once and return its full size plus display-sized images of
+    the whole page and of each zoom tile, keyed by the upload's digest.
+    """
+    img = Image.open(io.BytesIO(_data))
+    img.load()
+    img = img.convert("RGB")
+    full_size = img.size
+
+    def shrink(box):
+        crop = img.crop(box)
+        scale = DISPLAY_WIDTH / crop.width
+        if scale >= 1:
+            return crop, box
+        return crop.resize((DISPLAY_WIDTH, round(crop.height * scale)), Image.LANCZOS), box
+
+    views = {"Whole page": shrink((0, 0) + full_size)}
+    for name, box in tile_boxes(full_size).items():
+        views[name] = shrink(box)
+    return full_size, views
+
+
+def parse_labels(text):
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def assign_labels():
+    """Pair labels with pending clicks in order; unmatched clicks / labels stay for the next batch."""
+    labels = parse_labels(st.session_state.labels_text)
+    pending = st.session_state.pending_clicks
+    n = min(len(labels), len(pending))
+    for label, p in zip(labels[:n], pending[:n]):
+        st.session_state.field_map[label] = {"x": p["x"], "y": p["y"]}
+    st.session_state.pending_clicks = pending[n:]
+    st.session_state.labels_text = "\n".join(labels[n:])
+    st.session_state.added = n
+
+
+def clear_clicks():
+    st.session_state.pending_clicks = []
+
+
+# ---------------------------
+# UI
+# ---------------------------
 st.set_page_config(page_title="1040 Field Mapper", layout="wide")
 st.title("🗺️ Form 1040 Coordinate Mapper")
 
 st.caption(
-    "Click on each field you want to label. "
-    "The coordinates (in ReportLab's coordinate system) will be saved to a JSON mapping."
+    "Click each field you want to label, then enter the labels in click order. "
+    "Coordinates are saved in ReportLab's coordinate system (PDF points, bottom-left origin)."
 )
 
 uploaded = st.file_uploader("Upload a page image (PNG)", type=["png", "jpg"])
 
+# --- Session state for mapping ---
+if "field_map" not in st.session_state:
+    st.session_state.field_map = {}
+if "pending_clicks" not in st.session_state:
+    st.session_state.pending_clicks = []
+if "last_click" not in st.session_state:
+    st.session_state.last_click = None
+
 if uploaded:
-    img = Image.open(uploaded)
-    width, height = img.size
-    st.image(img, caption=f"Image size: {width}×{height}", width=850)
-    coords = streamlit_image_coordinates(img, key="mapper", width=850)
+    data = uploaded.getvalue()
+    digest = hashlib.sha1(data).hexdigest()
+    full_size, views = load_views(digest, data)
 
+    col_img, col_side = st.columns([3, 1])
+    with col_side:
+        st.write(f"Image size: {full_size[0]}×{full_size[1]} px")
+        view_name = st.selectbox("Zoom", list(views), help="Tiles are cropped from the full-resolution scan")
 
-    # --- Session state for mapping ---
-    if "field_map" not in st.session_state:
-        st.session_state.field_map = {}
+    display_img, view_box = views[view_name]
+    with col_img:
+        coords = streamlit_image_coordinates(display_img, key=f"mapper_{digest}_{view_name}")
 
+    # The component returns the last click on every rerun; record each click once.
     if coords is not None:
-        x = round(coords["x"], 2)
-        y = round(height - coords["y"], 2)  # convert to bottom-left origin
-        field_label = st.text_input("Enter field label (e.g. line1a_wages, line2b_interest):", key=f"label_{x}_{y}")
-        if st.button("Add Field", key=f"btn_{x}_{y}"):
-            st.session_state.field_map[field_label] = {"x": x, "y": y}
-            st.success(f"✅ Added {field_label} → ({x}, {y})")
+        click_id = (digest, view_name, coords.get("unix_time"), coords["x"], coords["y"])
+        if click_id != st.session_state.last_click:
+            st.session_state.last_click = click_id
+            fx, fy = display_to_full(coords, view_box, display_img.size)
+            x, y = full_to_points(fx, fy, full_size)
+            st.session_state.pending_clicks.append({"x": x, "y": y, "px": [round(fx, 1), round(fy, 1)]})
+
+    with col_side:
+        pending = st.session_state.pending_clicks
+        st.subheader(f"🖱️ Pending clicks ({len(pending)})")
+        for i, p in enumerate(pending, start=1):
+            st.text(f"{i}. ({p['x']}, {p['y']}) pt")
+
+        labels_text = st.text_area(
+            "Labels, one per line in click order (e.g. line1a_wages, line2b_interest):",
+            key="labels_text",
+            height=160,
+        )
+        labels = parse_labels(labels_text)
+        if labels and len(labels) != len(pending):
+            st.caption(f"{len(labels)} label(s) for {len(pending)} click(s); extras are left pending.")
+
+        c1, c2 = st.columns(2)
+        c1.button("Add fields", on_click=assign_labels, disabled=not (labels and pending))
+        c2.button("Clear clicks", on_click=clear_clicks, disabled=not pending)
+        if st.session_state.get("added"):
+            st.success(f"✅ Added {st.session_state.pop('added')} field(s)")
 
     if st.session_state.field_map:
         st.subheader("📋 Current field map")
         st.json(st.session_state.field_map)
 
-        # Export option
-        if st.button("💾 Export JSON"):
-            json_str = json.dumps(st.session_state.field_map, indent=2)
-            st.download_button(
-                "⬇️ Download field_map_1040.json",
-                data=json_str,
-                file_name="field_map_1040.json",
-                mime="application/json",
-            )
+        json_str = json.dumps(st.session_state.field_map, indent=2)
+        st.download_button(
+            "⬇️ Download field_map_1040.json",
+            data=json_str,
+            file_name="field_map_1040.json",
+            mime="application/json",
+        )
 else:
     st.info("📤 Upload your flattened 1040 image (e.g. f1040_page1.png) to begin.")
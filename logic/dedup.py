@@ -0,0 +1,174 @@
+# logic/dedup.py
+#
+# Cheap duplicate detection that runs *before* text extraction / OCR.
+#
+#   exact    → identical file bytes (SHA-256)
+#   near     → every page has the same normalized text layer as a page of an
+#              already-accepted upload
+#   possible → every page at least looks like a page of an accepted upload,
+#              where scanned pages are compared by a 16×16 average hash of a
+#              tiny grayscale render
+#
+# Only exact and near duplicates are skipped. An average hash cannot tell two
+# scanned W-2s on the same layout apart (the box amounts are a few pixels of
+# a 16×16 thumbnail), so "possible" duplicates are still parsed and are only
+# reported for a preparer to review.
+#
+# The text fingerprints also flag pages repeated inside one PDF so they are
+# extracted only once; scanned pages are always extracted.
+#
+# Fingerprinting opens and renders the upload, so it runs under the
+# document's budget (max_pages, wall_seconds, max_megapixels); a document
+# that runs out gets no fingerprints, which only turns off near-duplicate
+# detection for it. parse_documents runs it in the IsolatedParser worker
+# when there is one.
+import hashlib
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from logic import backends
+from logic.budgets import DocumentBudget
+
+THUMB_SIZE = 16                 # perceptual hash is THUMB_SIZE × THUMB_SIZE bits
+PHASH_MAX_DISTANCE = 12         # max differing bits for two scans to count as the same page
+MIN_TEXT_CHARS = 20             # below this a page's text layer is ignored for hashing
+
+# ("text", sha1 hex) or ("image", (hash_bits, bit_count))
+Fingerprint = Tuple[str, Any]
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _text_hash(text: str) -> str:
+    norm = re.sub(r"\s+", " ", text).strip().lower()
+    return hashlib.sha1(norm.encode("utf-8")).hexdigest()
+
+
+def _average_hash(page) -> Tuple[int, int]:
+    fitz = backends.module("fitz")
+    rect = page.rect
+    matrix = fitz.Matrix(THUMB_SIZE / rect.width, THUMB_SIZE / rect.height)
+    pix = page.get_pixmap(matrix=matrix, colorspace=fitz.csGRAY, alpha=False)
+    samples = pix.samples
+    pixels = [samples[y * pix.stride + x] for y in range(pix.height) for x in range(pix.width)]
+    if not pixels:
+        return 0, 0
+    mean = sum(pixels) / len(pixels)
+    bits = 0
+    for p in pixels:
+        bits = (bits << 1) | (1 if p > mean else 0)
+    return bits, len(pixels)
+
+
+def page_fingerprints(data: bytes, budget: Optional[DocumentBudget] = None) -> List[Fingerprint]:
+    """
+    One fingerprint per page; [] when PyMuPDF is unavailable, the PDF won't
+    open, or the `budget` runs out (too many pages, too much time) before
+    every page is fingerprinted.
+    """
+    if not backends.is_enabled("pymupdf"):
+        return []
+    (fitz,) = backends.require("pymupdf")
+    try:
+        doc = fitz.open(stream=data, filetype="pdf")
+    except Exception:
+        return []
+    prints: List[Fingerprint] = []
+    try:
+        for page in doc:
+            if budget is not None and not budget.allow_page():
+                return []
+            text = page.get_text() or ""
+            if len(text.strip()) >= MIN_TEXT_CHARS:
+                prints.append(("text", _text_hash(text)))
+            elif budget is not None and not budget.allow_pixels(THUMB_SIZE, THUMB_SIZE):
+                return []
+            else:
+                prints.append(("image", _average_hash(page)))
+    finally:
+        doc.close()
+    return prints
+
+
+def same_page(a: Fingerprint, b: Fingerprint) -> bool:
+    """Pages with identical text layers; scanned pages are never the same page."""
+    return a[0] == b[0] == "text" and a[1] == b[1]
+
+
+def similar_page(a: Fingerprint, b: Fingerprint) -> bool:
+    """same_page(), or two scans whose average hashes are within PHASH_MAX_DISTANCE bits."""
+    if a[0] != b[0]:
+        return False
+    if a[0] == "text":
+        return a[1] == b[1]
+    (bits_a, n_a), (bits_b, n_b) = a[1], b[1]
+    return n_a == n_b and n_a > 0 and bin(bits_a ^ bits_b).count("1") <= PHASH_MAX_DISTANCE
+
+
+def duplicate_pages(prints: List[Fingerprint]) -> Dict[int, int]:
+    """Map page index → index of the earlier page with the same text layer in the same document."""
+    dupes: Dict[int, int] = {}
+    for i, fp in enumerate(prints):
+        for j in range(i):
+            if j not in dupes and same_page(fp, prints[j]):
+                dupes[i] = j
+                break
+    return dupes
+
+
+class DuplicateIndex:
+    """
+    Remembers accepted uploads within one batch and classifies new ones.
+
+        index = DuplicateIndex()
+        dup = index.check(data, name)   # None, or {"kind", "duplicate_of", ...}
+        if dup is None or dup["kind"] == "possible":   # "possible" is parsed and reviewed
+            if parse(data):
+                index.add(data, name)   # only once it parsed: a failed upload must not hide a copy
+    """
+
+    def __init__(self, fingerprinter: Optional[Callable[[bytes], List[Fingerprint]]] = None):
+        # page_fingerprints() by default; parse_documents passes a budgeted /
+        # isolated one
+        self._fingerprinter = fingerprinter or page_fingerprints
+        self._by_hash: Dict[str, str] = {}
+        self._pages: List[Tuple[str, List[Fingerprint]]] = []
+        self._last: Optional[bytes] = None
+        self._last_digest = ""
+        self._last_prints: Optional[List[Fingerprint]] = None
+
+    # check(), add() and fingerprints() are called back to back on the same
+    # bytes; hash and render each upload at most once.
+    def digest(self, data: bytes) -> str:
+        if self._last is not data:
+            self._last, self._last_digest, self._last_prints = data, content_hash(data), None
+        return self._last_digest
+
+    def fingerprints(self, data: bytes) -> List[Fingerprint]:
+        self.digest(data)
+        if self._last_prints is None:
+            self._last_prints = self._fingerprinter(data)
+        return self._last_prints
+
+    def check(self, data: bytes, filename: str) -> Optional[Dict[str, Any]]:
+        digest = self.digest(data)
+        if digest in self._by_hash:
+            return {"filename": filename, "kind": "exact", "duplicate_of": self._by_hash[digest], "sha256": digest}
+        prints = self.fingerprints(data)
+        if not prints:
+            return None
+        for other_name, other_prints in self._pages:
+            if all(any(same_page(p, q) for q in other_prints) for p in prints):
+                return {"filename": filename, "kind": "near", "duplicate_of": other_name, "sha256": digest}
+        for other_name, other_prints in self._pages:
+            if all(any(similar_page(p, q) for q in other_prints) for p in prints):
+                return {"filename": filename, "kind": "possible", "duplicate_of": other_name, "sha256": digest}
+        return None
+
+    def add(self, data: bytes, filename: str) -> None:
+        self._by_hash[self.digest(data)] = filename
+        prints = self.fingerprints(data)
+        if prints:
+            self._pages.append((filename, prints))
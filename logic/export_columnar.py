@@ -0,0 +1,286 @@
+# logic/export_columnar.py
+#
+# Flatten parse_documents() output plus compute_tax_summary() results into one
+# typed row per return and write them to columnar files for aggregate queries.
+#
+#   *.parquet          → Parquet, one row group per flushed batch   (needs pyarrow)
+#   *.arrow / *.feather → Arrow IPC file, one record batch per flush (needs pyarrow)
+#   *.csv              → CSV fallback (stdlib only; appends across runs)
+#
+# "missing" sentinels become nulls and amount strings become float64 dollars.
+# A return with several documents of one form type (two W-2s) gets their
+# count in <prefix>_count, their amounts summed and the first non-missing
+# value of each text field, so the document columns agree with tax_*.
+import argparse
+import csv
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from logic.mapping_plan import iter_documents
+from logic.money import cents_to_dollars, parse_cents
+from logic.parse_documents import W2_FIELDS, W2_AMOUNT_FIELDS
+from logic.parse_1099int import INT_1099_FIELDS, INT_1099_AMOUNT_FIELDS
+from logic.parse_1099nec import HARD_CODED_1099NEC, NEC_1099_AMOUNT_FIELDS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # CSV fallback only
+    pa = None
+    pq = None
+
+NEC_1099_FIELDS = tuple(HARD_CODED_1099NEC.keys())
+
+TAX_FIELDS = (
+    "wages",
+    "interest",
+    "nec",
+    "agi",
+    "standard_deduction",
+    "taxable_income",
+    "estimated_tax",
+    "withholding",
+    "balance_due",
+    "refund",
+)
+
+# (canonical form type, column prefix, fields, amount fields)
+DOCUMENT_SOURCES = (
+    ("W-2", "w2", W2_FIELDS, W2_AMOUNT_FIELDS),
+    ("1099-INT", "int", INT_1099_FIELDS, INT_1099_AMOUNT_FIELDS),
+    ("1099-NEC", "nec", NEC_1099_FIELDS, NEC_1099_AMOUNT_FIELDS),
+)
+
+
+def _build_columns() -> List[Tuple[str, str]]:
+    cols = [("client_id", "string"), ("filing_status", "string")]
+    for _, prefix, fields, amounts in DOCUMENT_SOURCES:
+        cols.append((f"{prefix}_present", "bool"))
+        cols.append((f"{prefix}_count", "int64"))
+        cols.append((f"{prefix}_filename", "string"))   # "; "-joined when there are several
+        for k in fields:
+            cols.append((f"{prefix}_{k}", "float64" if k in amounts else "string"))
+    for k in TAX_FIELDS:
+        cols.append((f"tax_{k}", "float64"))
+    return cols
+
+
+COLUMNS = _build_columns()
+COLUMN_NAMES = [name for name, _ in COLUMNS]
+
+
+def arrow_schema():
+    if pa is None:
+        raise ImportError("pyarrow is required for Parquet/Arrow export; use a .csv path instead")
+    types = {"string": pa.string(), "float64": pa.float64(), "int64": pa.int64(), "bool": pa.bool_()}
+    return pa.schema([(name, types[t]) for name, t in COLUMNS])
+
+
+# ---------------------------
+# Flattening
+# ---------------------------
+def _amount(v: Any) -> Optional[float]:
+    c = parse_cents(v)
+    return None if c is None else cents_to_dollars(c)
+
+
+def _text(v: Any) -> Optional[str]:
+    if v is None or v == "missing":
+        return None
+    return str(v)
+
+
+def _doc_cents(doc: Dict[str, Any], field: str) -> Optional[int]:
+    cents = doc.get("amounts_cents")
+    if cents is not None:
+        return cents.get(field)
+    return parse_cents((doc.get("parsed_fields") or {}).get(field))
+
+
+def flatten_return(
+    parsed: Dict[str, Any],
+    calc: Optional[Dict[str, Any]] = None,
+    client_id: str = "",
+    filing_status: str = "",
+) -> Dict[str, Any]:
+    """
+    One typed row (column name → value) for a parsed + computed return.
+    Documents come from "document_list" when present (see
+    mapping_plan.iter_documents), so every uploaded form is counted.
+    """
+    by_form: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for form, doc in iter_documents(parsed):
+        by_form.setdefault(form, []).append(doc)
+    row: Dict[str, Any] = {"client_id": client_id or None, "filing_status": filing_status or None}
+
+    for form, prefix, fields, amounts in DOCUMENT_SOURCES:
+        docs = by_form.get(form, [])
+        row[f"{prefix}_present"] = bool(docs)
+        row[f"{prefix}_count"] = len(docs)
+        names = [n for n in (_text(d.get("filename")) for d in docs) if n]
+        row[f"{prefix}_filename"] = "; ".join(names) or None
+        for k in fields:
+            if k in amounts:
+                found = [c for c in (_doc_cents(d, k) for d in docs) if c is not None]
+                row[f"{prefix}_{k}"] = cents_to_dollars(sum(found)) if found else None
+            else:
+                values = (_text((d.get("parsed_fields") or {}).get(k)) for d in docs)
+                row[f"{prefix}_{k}"] = next((v for v in values if v is not None), None)
+
+    calc = calc or {}
+    for k in TAX_FIELDS:
+        row[f"tax_{k}"] = _amount(calc.get(k))
+    return row
+
+
+# ---------------------------
+# Writer
+# ---------------------------
+def _format_for_path(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".parquet":
+        return "parquet"
+    if ext in (".arrow", ".feather", ".ipc"):
+        return "arrow"
+    if ext == ".csv":
+        return "csv"
+    raise ValueError(f"Unsupported export format for {path!r} (use .parquet, .arrow or .csv)")
+
+
+class ReturnExporter:
+    """
+    Buffer flattened returns column-wise and write them out in row groups of
+    `row_group_size`, so memory stays flat no matter how large the batch is.
+
+        with ReturnExporter("season.parquet") as out:
+            for parsed, calc in results:
+                out.add(parsed, calc, client_id=...)
+    """
+
+    def __init__(self, path: str, row_group_size: int = 10_000):
+        self.path = path
+        self.format = _format_for_path(path)
+        self.row_group_size = row_group_size
+        self.rows_written = 0
+        self._columns: Dict[str, List[Any]] = {name: [] for name in COLUMN_NAMES}
+        self._buffered = 0
+        self._writer = None
+        self._csv_file = None
+
+        if self.format in ("parquet", "arrow"):
+            schema = arrow_schema()
+            if self.format == "parquet":
+                self._writer = pq.ParquetWriter(path, schema)
+            else:
+                self._writer = pa.ipc.new_file(path, schema)
+            self._schema = schema
+        else:
+            write_header = not os.path.exists(path) or os.path.getsize(path) == 0
+            self._csv_file = open(path, "a", newline="", encoding="utf-8")
+            self._csv = csv.writer(self._csv_file)
+            if write_header:
+                self._csv.writerow(COLUMN_NAMES)
+
+    def add(self, parsed: Dict[str, Any], calc: Optional[Dict[str, Any]] = None,
+            client_id: str = "", filing_status: str = "") -> None:
+        self.add_row(flatten_return(parsed, calc, client_id, filing_status))
+
+    def add_row(self, row: Dict[str, Any]) -> None:
+        for name in COLUMN_NAMES:
+            self._columns[name].append(row.get(name))
+        self._buffered += 1
+        if self._buffered >= self.row_group_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._buffered:
+            return
+        if self._writer is not None:
+            table = pa.Table.from_pydict(self._columns, schema=self._schema)
+            self._writer.write_table(table)
+        else:
+            cols = [self._columns[name] for name in COLUMN_NAMES]
+            self._csv.writerows(
+                ["" if v is None else v for v in values] for values in zip(*cols)
+            )
+            self._csv_file.flush()
+        self.rows_written += self._buffered
+        self._columns = {name: [] for name in COLUMN_NAMES}
+        self._buffered = 0
+
+    def close(self) -> None:
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._csv_file is not None:
+            self._csv_file.close()
+            self._csv_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def export_returns(
+    results: Iterable[Dict[str, Any]],
+    path: str,
+    row_group_size: int = 10_000,
+) -> int:
+    """
+    Export an iterable of {"parsed": ..., "calc": ..., "client_id": ..., "filing_status": ...}
+    records. Returns the number of rows written.
+    """
+    with ReturnExporter(path, row_group_size) as out:
+        for r in results:
+            out.add(r["parsed"], r.get("calc"), r.get("client_id", ""), r.get("filing_status", ""))
+    return out.rows_written
+
+
+def iter_job_store_results(db_path: str) -> Iterable[Dict[str, Any]]:
+    """Yield export records for every client whose parse stage finished in a job store."""
+    from logic.job_store import open_job_store, stage_output
+
+    conn = open_job_store(db_path)
+    try:
+        clients = conn.execute("SELECT client_id, filing_status FROM clients ORDER BY client_id").fetchall()
+        for c in clients:
+            parsed = stage_output(conn, c["client_id"], "parse")
+            if parsed is None:
+                continue
+            yield {
+                "client_id": c["client_id"],
+                "filing_status": c["filing_status"],
+                "parsed": parsed,
+                "calc": stage_output(conn, c["client_id"], "tax"),
+            }
+    finally:
+        conn.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Export parsed fields and tax results to columnar files.")
+    parser.add_argument("source", help="Job store database (.db/.sqlite) or JSON lines of export records")
+    parser.add_argument("out", help="Output path (.parquet, .arrow or .csv)")
+    parser.add_argument("--row-group-size", type=int, default=10_000)
+    args = parser.parse_args(argv)
+
+    if args.source.endswith((".jsonl", ".json")):
+        def records():
+            with open(args.source, "r", encoding="utf-8") as fh:
+                for line in fh:
+                    if line.strip():
+                        yield json.loads(line)
+        source = records()
+    else:
+        source = iter_job_store_results(args.source)
+
+    n = export_returns(source, args.out, args.row_group_size)
+    print(f"Wrote {n} row(s) to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
 # logic/form1040_model.py
-from copy import deepcopy
+import math
+import numbers
+from array import array
+from typing import Any, Dict, Iterable, List, Optional
 
 FORM1040_TEMPLATE = {
     # Identification (shown on Page 1)
@@ -45,5 +48,225 @@ FORM1040_TEMPLATE = {
     "line38_estimated_tax_penalty": 0.0,
 }
 
+# Supplementary keys build_form1040() adds on top of the template when the
+# corresponding source document is present.
+FORM1040_EXTRA_FIELDS = {
+    # W-2
+    "employee_ssn": "",
+    "employer_ein": "",
+    "employer_name_address": "",
+    "employee_name_address": "",
+    "w2_box3_social_security_wages": 0.0,
+    "w2_box4_social_security_tax": 0.0,
+    "w2_box5_medicare_wages": 0.0,
+    "w2_box6_medicare_tax": 0.0,
+    "state_income_tax": 0.0,
+    "other_withholding": 0.0,
+    # 1099-INT
+    "payer_name_1099int": "",
+    "payer_tin_1099int": "",
+    "interest_us_savings": 0.0,
+    "foreign_tax_paid": 0.0,
+    # 1099-NEC
+    "payer_name_1099nec": "",
+    "payer_tin_1099nec": "",
+    "nec_state_income": 0.0,
+}
+
+FORM1040_FIELDS = tuple(FORM1040_TEMPLATE) + tuple(FORM1040_EXTRA_FIELDS)
+AMOUNT_FIELDS = tuple(
+    k for k in FORM1040_FIELDS
+    if isinstance({**FORM1040_TEMPLATE, **FORM1040_EXTRA_FIELDS}[k], float)
+)
+TEXT_FIELDS = tuple(k for k in FORM1040_FIELDS if k not in AMOUNT_FIELDS)
+
+
 def new_form1040():
-    return deepcopy(FORM1040_TEMPLATE)
+    # Template values are immutable, so a shallow copy is enough.
+    return dict(FORM1040_TEMPLATE)
+
+
+# ---------------------------
+# Compact single-return record
+# ---------------------------
+class Form1040Record:
+    """
+    Slotted stand-in for the Form 1040 dict (no per-instance __dict__).
+
+    Supports the dict operations build_form1040() uses (form[k], form[k] = v,
+    form.get(k)), so it can be filled directly. Supplementary fields that were
+    never set stay unset, and unknown keys go to a side dict, so
+    to_dict() / from_dict() round-trip exactly.
+    """
+
+    __slots__ = FORM1040_FIELDS + ("_extra",)
+
+    def __init__(self, **values):
+        for k, v in FORM1040_TEMPLATE.items():
+            object.__setattr__(self, k, v)
+        self._extra = None
+        for k, v in values.items():
+            self[k] = v
+
+    @classmethod
+    def from_dict(cls, form: Dict[str, Any]) -> "Form1040Record":
+        rec = cls.__new__(cls)
+        rec._extra = None
+        for k, v in form.items():
+            rec[k] = v
+        return rec
+
+    def to_dict(self) -> Dict[str, Any]:
+        out = {}
+        for k in FORM1040_FIELDS:
+            try:
+                out[k] = getattr(self, k)
+            except AttributeError:
+                pass
+        if self._extra:
+            out.update(self._extra)
+        return out
+
+    def __getitem__(self, key: str) -> Any:
+        if key in _FIELD_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key in _FIELD_SET:
+            object.__setattr__(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __contains__(self, key: str) -> bool:
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Form1040Record):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    def __repr__(self) -> str:
+        return f"Form1040Record({self.to_dict()!r})"
+
+
+_FIELD_SET = frozenset(FORM1040_FIELDS)
+
+
+# ---------------------------
+# Column store for batches
+# ---------------------------
+class Form1040Batch:
+    """
+    Column-oriented store for many returns: each amount field is a packed
+    array('d') (NaN marks a field the return did not have) and each text
+    field a plain list. Converts losslessly to and from the dict form; amount
+    fields must be real numbers, and NaN is rejected since it means unset.
+    """
+
+    def __init__(self):
+        self.amounts = {k: array("d") for k in AMOUNT_FIELDS}
+        self.texts: Dict[str, List[Any]] = {k: [] for k in TEXT_FIELDS}
+        self._extra: List[Optional[Dict[str, Any]]] = []
+
+    @classmethod
+    def from_dicts(cls, forms: Iterable[Any]) -> "Form1040Batch":
+        batch = cls()
+        for f in forms:
+            batch.append(f)
+        return batch
+
+    def __len__(self) -> int:
+        return len(self._extra)
+
+    def append(self, form: Any) -> None:
+        """Add a return given as a dict or Form1040Record."""
+        if isinstance(form, Form1040Record):
+            form = form.to_dict()
+        # validate every amount before touching the columns, so a bad return
+        # cannot leave them different lengths
+        values = [_amount(form, k) for k in self.amounts]
+        for col, v in zip(self.amounts.values(), values):
+            col.append(v)
+        for k, col in self.texts.items():
+            col.append(form.get(k, _UNSET))
+        extra = {k: v for k, v in form.items() if k not in _FIELD_SET}
+        self._extra.append(extra or None)
+
+    def column(self, name: str):
+        if name in self.amounts:
+            return self.amounts[name]
+        return self.texts[name]
+
+    def record_dict(self, i: int) -> Dict[str, Any]:
+        out = {}
+        for k in FORM1040_FIELDS:
+            if k in self.amounts:
+                v = self.amounts[k][i]
+                if math.isnan(v):
+                    continue
+                out[k] = v
+            else:
+                v = self.texts[k][i]
+                if v is _UNSET:
+                    continue
+                out[k] = v
+        if self._extra[i]:
+            out.update(self._extra[i])
+        return out
+
+    def record(self, i: int) -> Form1040Record:
+        return Form1040Record.from_dict(self.record_dict(i))
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return [self.record_dict(i) for i in range(len(self))]
+
+    def to_structured_array(self):
+        """NumPy structured array of the amount columns (one row per return, NaN where unset)."""
+        try:
+            import numpy as np
+        except ImportError:
+            raise ImportError("numpy is required for to_structured_array()") from None
+        arr = np.empty(len(self), dtype=[(k, np.float64) for k in AMOUNT_FIELDS])
+        for k, col in self.amounts.items():
+            arr[k] = np.frombuffer(col, dtype=np.float64) if len(col) else []
+        return arr
+
+
+class _Unset:
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return "<unset>"
+
+
+_UNSET = _Unset()
+
+
+def _amount(form: Dict[str, Any], key: str) -> float:
+    if key not in form:
+        return math.nan
+    v = form[key]
+    if isinstance(v, bool) or not isinstance(v, numbers.Real):
+        raise TypeError(f"{key} must be a number, got {type(v).__name__}: {v!r}")
+    v = float(v)
+    if math.isnan(v):
+        raise ValueError(f"{key} is NaN (NaN marks an unset amount in Form1040Batch)")
+    return v
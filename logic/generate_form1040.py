@@ -1,17 +1,55 @@
 import io
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
 
-def generate_form_1040(calc_data, filing_status, taxpayer_name, ssn, address):
+from logic import backends
+
+TEMPLATE_DIR = Path(__file__).resolve().parent / "templates"
+PAGE_IMAGES = (TEMPLATE_DIR / "f1040_page1.png", TEMPLATE_DIR / "f1040_page2.png")
+LETTER = (612.0, 792.0)   # reportlab.lib.pagesizes.letter, without importing ReportLab
+
+
+def _canvas(target):
+    """ReportLab is imported the first time a form is actually rendered."""
+    canvas_mod, _, _ = backends.require("reportlab")
+    return canvas_mod.Canvas(target, pagesize=LETTER)
+
+
+# ---------------------------
+# Template (loaded once per process)
+# ---------------------------
+@lru_cache(maxsize=1)
+def _template_images():
+    """Decode the page background images once; every render reuses the pixels."""
+    for p in PAGE_IMAGES:
+        if not p.exists():
+            raise FileNotFoundError(f"Form 1040 template image not found: {p}")
+    _, _, utils = backends.require("reportlab")
+    images = tuple(utils.ImageReader(str(p)) for p in PAGE_IMAGES)
+    for img in images:
+        img.getRGBData()   # force decode now so the first return doesn't pay for it
+    return images
+
+
+@lru_cache(maxsize=1)
+def _background_pdf() -> bytes:
+    """A two-page PDF holding only the page backgrounds, compressed once per process."""
     buffer = io.BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
+    c = _canvas(buffer)
+    for img in _template_images():
+        c.drawImage(img, 0, 0, width=612, height=792)
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
 
-    # --- PAGE 1 ---
-    c.drawImage("logic/templates/f1040_page1.png", 0, 0, width=612, height=792)
+
+def _draw_fields(c, calc_data, taxpayer_name, ssn, address):
     c.setFont("Helvetica", 10)
-    c.drawString(100, 720, taxpayer_name)
-    c.drawString(400, 720, ssn)
-    c.drawString(100, 700, address)
+    c.drawString(100, 720, taxpayer_name or "")
+    c.drawString(400, 720, ssn or "")
+    c.drawString(100, 700, address or "")
 
     # Income fields
     c.drawRightString(510, 490, f"{calc_data['agi']:.2f}")
@@ -21,9 +59,145 @@ def generate_form_1040(calc_data, filing_status, taxpayer_name, ssn, address):
     c.drawRightString(510, 360, f"{calc_data['refund']:.2f}")
     c.drawRightString(510, 330, f"{calc_data['balance_due']:.2f}")
 
+
+def generate_form_1040(calc_data, filing_status, taxpayer_name, ssn, address):
+    page1, page2 = _template_images()
+    buffer = io.BytesIO()
+    c = _canvas(buffer)
+
+    # --- PAGE 1 ---
+    c.drawImage(page1, 0, 0, width=612, height=792)
+    _draw_fields(c, calc_data, taxpayer_name, ssn, address)
+
     c.showPage()
-    c.drawImage("logic/templates/f1040_page2.png", 0, 0, width=612, height=792)
+    c.drawImage(page2, 0, 0, width=612, height=792)
     c.save()
 
     buffer.seek(0)
     return buffer.getvalue()
+
+
+# ---------------------------
+# Batch rendering
+# ---------------------------
+def _identity(fields: Dict[str, Any]):
+    return (
+        fields.get("taxpayer_name", ""),
+        fields.get("taxpayer_ssn", ""),
+        fields.get("address_line", ""),
+    )
+
+
+def _render_merged(returns: Iterable[Dict[str, Any]], out_path: str) -> int:
+    """All returns in one PDF; each page background is a single shared form XObject."""
+    page1, page2 = _template_images()
+    c = _canvas(out_path)
+    for name, img in (("f1040_bg1", page1), ("f1040_bg2", page2)):
+        c.beginForm(name)
+        c.drawImage(img, 0, 0, width=612, height=792)
+        c.endForm()
+
+    n = 0
+    for fields in returns:
+        c.doForm("f1040_bg1")
+        _draw_fields(c, fields, *_identity(fields))
+        c.showPage()
+        c.doForm("f1040_bg2")
+        c.showPage()
+        n += 1
+    c.save()
+    return n
+
+
+def _render_files(returns: Iterable[Dict[str, Any]], out_dir: str) -> int:
+    """
+    One PDF per return. Only the text overlay is drawn per return; it is stamped
+    onto the pre-built background PDF so the page images are never re-encoded.
+    """
+    (pypdf,) = backends.require("pypdf")
+    PdfReader, PdfWriter = pypdf.PdfReader, pypdf.PdfWriter
+
+    background = _background_pdf()
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+
+    n = 0
+    for i, fields in enumerate(returns):
+        overlay_buf = io.BytesIO()
+        c = _canvas(overlay_buf)
+        _draw_fields(c, fields, *_identity(fields))
+        c.save()
+
+        overlay = PdfReader(io.BytesIO(overlay_buf.getvalue())).pages[0]
+        writer = PdfWriter()
+        for j, page in enumerate(PdfReader(io.BytesIO(background)).pages):
+            if j == 0:
+                page.merge_page(overlay)
+            writer.add_page(page)
+
+        stem = str(fields.get("client_id") or f"{i + 1:06d}")
+        stem = "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in stem)
+        with open(out / f"{stem}_1040.pdf", "wb") as fh:
+            writer.write(fh)
+        n += 1
+    return n
+
+
+def generate_form_1040_batch(
+    returns: Iterable[Dict[str, Any]],
+    out_path: Optional[str] = None,
+    out_dir: Optional[str] = None,
+) -> Dict[str, float]:
+    """
+    Render many returns with the template prepared once per process.
+
+    `returns` is an iterable of field dicts shaped like the app's form_fields:
+    compute_tax_summary() keys plus taxpayer_name / taxpayer_ssn / address_line
+    (and optionally client_id, used to name per-return files).
+
+    Pass `out_path` for one merged PDF, or `out_dir` for one PDF per return.
+    Returns throughput stats.
+    """
+    if (out_path is None) == (out_dir is None):
+        raise ValueError("Pass exactly one of out_path (merged PDF) or out_dir (one file per return)")
+
+    t0 = time.perf_counter()
+    _template_images()
+    if out_dir is not None:
+        _background_pdf()
+    t1 = time.perf_counter()
+
+    if out_path is not None:
+        n = _render_merged(returns, out_path)
+    else:
+        n = _render_files(returns, out_dir)
+    t2 = time.perf_counter()
+
+    render_seconds = t2 - t1
+    return {
+        "returns": n,
+        "template_seconds": round(t1 - t0, 4),
+        "render_seconds": round(render_seconds, 4),
+        "returns_per_second": round(n / render_seconds, 2) if render_seconds > 0 else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Batch-render Form 1040 overlays.")
+    parser.add_argument("returns", help="JSON lines file, one field dict per return")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--out", help="Write one merged PDF")
+    group.add_argument("--out-dir", help="Write one PDF per return")
+    args = parser.parse_args()
+
+    def _records():
+        with open(args.returns, "r", encoding="utf-8") as fh:
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+
+    stats = generate_form_1040_batch(_records(), out_path=args.out, out_dir=args.out_dir)
+    print(json.dumps(stats))
@@ -0,0 +1,609 @@
+# logic/job_store.py
+#
+# Durable, resumable job store for batch return processing.
+#
+# Every client moves through three stages:
+#     parse  → parse_documents()        (tracked per document)
+#     tax    → compute_tax_summary()
+#     render → generate_form_1040()
+#
+# State lives in a single SQLite file, so a batch that dies halfway (OCR hang,
+# OOM, killed worker) picks up exactly where it stopped: finished documents and
+# stages are never redone, and leases held by dead workers simply expire.
+# Any number of worker processes may share the same database file.
+import argparse
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+STAGES = ("parse", "tax", "render")
+DEFAULT_LEASE_SECONDS = 300.0
+DEFAULT_MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS clients (
+    client_id     TEXT PRIMARY KEY,
+    filing_status TEXT NOT NULL DEFAULT 'single',
+    identity      TEXT NOT NULL DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS documents (
+    client_id  TEXT NOT NULL,
+    path       TEXT NOT NULL,
+    sha256     TEXT NOT NULL,
+    status     TEXT NOT NULL DEFAULT 'pending',   -- pending | done | failed | duplicate
+    output     TEXT,
+    error      TEXT,
+    updated_at REAL,
+    PRIMARY KEY (client_id, path)
+);
+CREATE TABLE IF NOT EXISTS stages (
+    client_id     TEXT NOT NULL,
+    stage         TEXT NOT NULL,
+    status        TEXT NOT NULL DEFAULT 'pending',   -- pending | leased | done | failed
+    input_hash    TEXT,
+    output        TEXT,
+    lease_owner   TEXT,
+    lease_expires REAL,
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    error         TEXT,
+    updated_at    REAL,
+    PRIMARY KEY (client_id, stage)
+);
+CREATE INDEX IF NOT EXISTS stages_by_status ON stages (stage, status);
+"""
+
+
+# ---------------------------
+# Connection / helpers
+# ---------------------------
+def open_job_store(path: str) -> sqlite3.Connection:
+    """Open (and create if needed) a job store. Safe to call from many processes."""
+    conn = sqlite3.connect(path, timeout=30.0, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _json_hash(obj: Any) -> str:
+    return hashlib.sha256(json.dumps(obj, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+# ---------------------------
+# Enqueue
+# ---------------------------
+def add_client(
+    conn: sqlite3.Connection,
+    client_id: str,
+    paths: List[str],
+    filing_status: str = "single",
+    identity: Optional[Dict[str, str]] = None,
+) -> bool:
+    """
+    Register (or re-register) a client and its documents.
+
+    Documents whose content hash is unchanged keep their finished results.
+    If any document was added, removed or changed, the client's stages are
+    reset to pending so downstream outputs are recomputed. Returns True when
+    the client needs (re)processing.
+    """
+    hashes = {str(p): file_sha256(str(p)) for p in paths}
+    now = time.time()
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            "INSERT INTO clients (client_id, filing_status, identity) VALUES (?, ?, ?) "
+            "ON CONFLICT(client_id) DO UPDATE SET filing_status=excluded.filing_status, "
+            "identity=excluded.identity",
+            (client_id, filing_status, json.dumps(identity or {})),
+        )
+        existing = {
+            r["path"]: r["sha256"]
+            for r in conn.execute("SELECT path, sha256 FROM documents WHERE client_id=?", (client_id,))
+        }
+        changed = set(existing) != set(hashes)
+
+        for path in set(existing) - set(hashes):
+            conn.execute("DELETE FROM documents WHERE client_id=? AND path=?", (client_id, path))
+        for path, digest in hashes.items():
+            if existing.get(path) == digest:
+                continue
+            changed = True
+            conn.execute(
+                "INSERT OR REPLACE INTO documents (client_id, path, sha256, status, updated_at) "
+                "VALUES (?, ?, ?, 'pending', ?)",
+                (client_id, path, digest, now),
+            )
+
+        fresh = False
+        for stage in STAGES:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO stages (client_id, stage, updated_at) VALUES (?, ?, ?)",
+                (client_id, stage, now),
+            )
+            fresh = fresh or cur.rowcount > 0
+        if changed and not fresh:
+            conn.execute(
+                "UPDATE stages SET status='pending', output=NULL, error=NULL, attempts=0, "
+                "lease_owner=NULL, lease_expires=NULL, updated_at=? WHERE client_id=?",
+                (now, client_id),
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return changed or fresh
+
+
+def load_manifest(path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Manifest format (JSON):
+      {
+        "client-001": {
+          "files": ["in/client-001/w2.pdf", "in/client-001/1099int.pdf"],
+          "filing_status": "single",
+          "identity": {"taxpayer_name": "...", "taxpayer_ssn": "...", "address_line": "..."}
+        },
+        ...
+      }
+    Relative file paths are resolved against the manifest's directory.
+    """
+    base = Path(path).resolve().parent
+    with open(path, "r", encoding="utf-8") as fh:
+        manifest = json.load(fh)
+    for entry in manifest.values():
+        entry["files"] = [str((base / p).resolve()) for p in entry.get("files", [])]
+    return manifest
+
+
+def enqueue_manifest(conn: sqlite3.Connection, manifest: Dict[str, Dict[str, Any]]) -> int:
+    queued = 0
+    for client_id, entry in manifest.items():
+        if add_client(
+            conn,
+            client_id,
+            entry.get("files", []),
+            filing_status=entry.get("filing_status", "single"),
+            identity=entry.get("identity"),
+        ):
+            queued += 1
+    return queued
+
+
+# ---------------------------
+# Leasing
+# ---------------------------
+def lease_next(
+    conn: sqlite3.Connection,
+    worker_id: str,
+    lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+) -> Optional[Dict[str, Any]]:
+    """
+    Atomically claim the next runnable (client, stage). A stage is runnable when
+    it is pending, or leased by a worker whose lease has expired, and its previous
+    stage is done. Later stages are preferred so clients finish end to end.
+
+    An expired lease means the worker died or hung on that stage, which counts
+    as a failed attempt: once attempts reach max_attempts the stage is marked
+    failed instead of being leased again.
+    """
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            "UPDATE stages SET status='failed', "
+            "error='lease expired after ' || attempts || ' attempt(s); worker died or hung (last owner ' "
+            "|| COALESCE(lease_owner, '?') || ')', "
+            "lease_owner=NULL, lease_expires=NULL, updated_at=? "
+            "WHERE status='leased' AND lease_expires < ? AND attempts >= ?",
+            (now, now, max_attempts),
+        )
+        row = None
+        for i in reversed(range(len(STAGES))):
+            stage = STAGES[i]
+            prev = STAGES[i - 1] if i > 0 else None
+            row = conn.execute(
+                "SELECT client_id, stage, attempts FROM stages s "
+                "WHERE s.stage=? AND (s.status='pending' OR (s.status='leased' AND s.lease_expires < ?)) "
+                "AND (? IS NULL OR EXISTS (SELECT 1 FROM stages p WHERE p.client_id=s.client_id "
+                "AND p.stage=? AND p.status='done')) "
+                "LIMIT 1",
+                (stage, now, prev, prev),
+            ).fetchone()
+            if row:
+                break
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        conn.execute(
+            "UPDATE stages SET status='leased', lease_owner=?, lease_expires=?, "
+            "attempts=attempts+1, updated_at=? WHERE client_id=? AND stage=?",
+            (worker_id, now + lease_seconds, now, row["client_id"], row["stage"]),
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return {"client_id": row["client_id"], "stage": row["stage"], "attempts": row["attempts"] + 1}
+
+
+def renew_lease(
+    conn: sqlite3.Connection,
+    client_id: str,
+    stage: str,
+    worker_id: str,
+    lease_seconds: float = DEFAULT_LEASE_SECONDS,
+) -> bool:
+    """Extend a lease we still hold. Returns False if it was lost to another worker."""
+    cur = conn.execute(
+        "UPDATE stages SET lease_expires=? WHERE client_id=? AND stage=? "
+        "AND status='leased' AND lease_owner=?",
+        (time.time() + lease_seconds, client_id, stage, worker_id),
+    )
+    return cur.rowcount > 0
+
+
+def complete_stage(
+    conn: sqlite3.Connection,
+    client_id: str,
+    stage: str,
+    worker_id: str,
+    output: Any,
+    input_hash: str = "",
+) -> bool:
+    cur = conn.execute(
+        "UPDATE stages SET status='done', output=?, input_hash=?, error=NULL, "
+        "lease_owner=NULL, lease_expires=NULL, updated_at=? "
+        "WHERE client_id=? AND stage=? AND status='leased' AND lease_owner=?",
+        (json.dumps(output), input_hash, time.time(), client_id, stage, worker_id),
+    )
+    return cur.rowcount > 0
+
+
+def fail_stage(
+    conn: sqlite3.Connection,
+    client_id: str,
+    stage: str,
+    worker_id: str,
+    error: str,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+) -> None:
+    """Release a lease after an error; give up on the stage after max_attempts."""
+    conn.execute(
+        "UPDATE stages SET status=CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+        "error=?, lease_owner=NULL, lease_expires=NULL, updated_at=? "
+        "WHERE client_id=? AND stage=? AND lease_owner=?",
+        (max_attempts, error, time.time(), client_id, stage, worker_id),
+    )
+
+
+def stage_output(conn: sqlite3.Connection, client_id: str, stage: str) -> Optional[Any]:
+    row = conn.execute(
+        "SELECT output FROM stages WHERE client_id=? AND stage=? AND status='done'",
+        (client_id, stage),
+    ).fetchone()
+    return json.loads(row["output"]) if row and row["output"] else None
+
+
+def status_counts(conn: sqlite3.Connection) -> Dict[str, Dict[str, int]]:
+    out: Dict[str, Dict[str, int]] = {stage: {} for stage in STAGES}
+    for r in conn.execute("SELECT stage, status, COUNT(*) AS n FROM stages GROUP BY stage, status"):
+        out.setdefault(r["stage"], {})[r["status"]] = r["n"]
+    docs: Dict[str, int] = {}
+    for r in conn.execute("SELECT status, COUNT(*) AS n FROM documents GROUP BY status"):
+        docs[r["status"]] = r["n"]
+    out["documents"] = docs
+    return out
+
+
+# ---------------------------
+# Stage runners
+# ---------------------------
+def _run_parse(
+    conn,
+    client_id: str,
+    worker_id: str,
+    lease_seconds: float,
+    parser=None,
+    text_index=None,
+) -> Dict[str, Any]:
+    from logic.parse_documents import parse_documents, merge_parsed_results
+
+    docs = conn.execute(
+        "SELECT path, sha256, status, output FROM documents WHERE client_id=? ORDER BY path",
+        (client_id,),
+    ).fetchall()
+
+    results = []
+    failed: List[str] = []
+    seen: Dict[str, str] = {}
+    for d in docs:
+        # Exact duplicate uploads within a client are recorded, not parsed again.
+        if d["sha256"] in seen:
+            results.append({"duplicates": [{
+                "filename": os.path.basename(d["path"]),
+                "kind": "exact",
+                "duplicate_of": os.path.basename(seen[d["sha256"]]),
+                "sha256": d["sha256"],
+            }]})
+            conn.execute(
+                "UPDATE documents SET status='duplicate', updated_at=? WHERE client_id=? AND path=?",
+                (time.time(), client_id, d["path"]),
+            )
+            continue
+        seen[d["sha256"]] = d["path"]
+
+        if d["status"] == "done" and d["output"]:
+            results.append(json.loads(d["output"]))
+            continue
+        try:
+            with open(d["path"], "rb") as fh:
+                data = fh.read()
+            if hashlib.sha256(data).hexdigest() != d["sha256"]:
+                raise ValueError("file changed since it was enqueued; re-run enqueue")
+            f = io.BytesIO(data)
+            f.name = os.path.basename(d["path"])
+            # parse in the worker's budget subprocess: a runaway PDF is killed, not the worker
+            result = parse_documents([f], isolate=parser or False, index=text_index, client_id=client_id)
+            if result.get("failed"):
+                raise RuntimeError(result["failed"][0]["error"])
+        except Exception as e:
+            conn.execute(
+                "UPDATE documents SET status='failed', error=?, updated_at=? WHERE client_id=? AND path=?",
+                (f"{type(e).__name__}: {e}", time.time(), client_id, d["path"]),
+            )
+            failed.append(f"{os.path.basename(d['path'])}: {type(e).__name__}: {e}")
+        else:
+            conn.execute(
+                "UPDATE documents SET status='done', output=?, error=NULL, updated_at=? "
+                "WHERE client_id=? AND path=?",
+                (json.dumps(result), time.time(), client_id, d["path"]),
+            )
+            results.append(result)
+        if not renew_lease(conn, client_id, "parse", worker_id, lease_seconds):
+            raise RuntimeError("lease lost during parse")
+
+    # Never hand a return with missing documents to the tax stage; the stage is
+    # retried (finished documents are kept) until max_attempts.
+    if failed:
+        raise RuntimeError(f"{len(failed)} document(s) failed: " + "; ".join(failed))
+    return merge_parsed_results(results)
+
+
+def _run_tax(conn, client_id: str, client: sqlite3.Row) -> Dict[str, Any]:
+    from logic.money import cents_dict_to_dollars, parse_cents
+    from logic.tax_2024 import compute_tax_summary_cents, income_cents_from_summary
+
+    parsed = stage_output(conn, client_id, "parse") or {}
+    s = parsed.get("summary_cents")
+    if s is None:
+        s = {
+            group: {k: parse_cents(v, 0) for k, v in values.items()}
+            for group, values in parsed.get("summary", {}).items()
+        }
+    calc_cents = compute_tax_summary_cents(
+        income_cents=income_cents_from_summary(s),
+        withholding_cents=s.get("withholding", {}).get("federal", 0),
+        filing_status=client["filing_status"],
+    )
+    return cents_dict_to_dollars(calc_cents)
+
+
+def _run_render(conn, client_id: str, client: sqlite3.Row, out_dir: str) -> Dict[str, Any]:
+    from logic.generate_form1040 import generate_form_1040
+
+    calc = stage_output(conn, client_id, "tax") or {}
+    identity = json.loads(client["identity"] or "{}")
+    pdf_bytes = generate_form_1040(
+        calc_data=calc,
+        filing_status=client["filing_status"],
+        taxpayer_name=identity.get("taxpayer_name", ""),
+        ssn=identity.get("taxpayer_ssn", ""),
+        address=identity.get("address_line", ""),
+    )
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    safe_id = "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in client_id)
+    target = out / f"{safe_id}_1040.pdf"
+    tmp = target.with_suffix(".pdf.tmp")
+    tmp.write_bytes(pdf_bytes)
+    os.replace(tmp, target)   # never leave a half-written PDF behind
+    return {"path": str(target), "bytes": len(pdf_bytes)}
+
+
+def run_worker(
+    conn: sqlite3.Connection,
+    out_dir: str,
+    worker_id: Optional[str] = None,
+    lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    max_jobs: Optional[int] = None,
+) -> Dict[str, int]:
+    """
+    Lease and run stages until nothing is runnable (or max_jobs is reached).
+    Returns counts of completed / failed / lost stages for this worker.
+    """
+    from logic.budgets import IsolatedParser
+    from logic.text_index import open_text_index_from_env
+
+    worker_id = worker_id or default_worker_id()
+    counts = {"done": 0, "failed": 0, "lost": 0}
+    parser = IsolatedParser()   # one budget subprocess per worker, restarted if a document overruns
+    text_index = open_text_index_from_env()   # TAXRETURN_TEXT_INDEX, shared by all workers
+
+    try:
+        while max_jobs is None or sum(counts.values()) < max_jobs:
+            job = lease_next(conn, worker_id, lease_seconds, max_attempts)
+            if job is None:
+                break
+            client_id, stage = job["client_id"], job["stage"]
+            client = conn.execute("SELECT * FROM clients WHERE client_id=?", (client_id,)).fetchone()
+            try:
+                if stage == "parse":
+                    output = _run_parse(conn, client_id, worker_id, lease_seconds, parser, text_index)
+                    input_hash = _json_hash([
+                        r["sha256"] for r in conn.execute(
+                            "SELECT sha256 FROM documents WHERE client_id=? ORDER BY path", (client_id,)
+                        )
+                    ])
+                elif stage == "tax":
+                    output = _run_tax(conn, client_id, client)
+                    input_hash = _json_hash([stage_output(conn, client_id, "parse"), client["filing_status"]])
+                else:
+                    output = _run_render(conn, client_id, client, out_dir)
+                    input_hash = _json_hash([stage_output(conn, client_id, "tax"), client["identity"]])
+            except Exception as e:
+                fail_stage(conn, client_id, stage, worker_id, f"{type(e).__name__}: {e}", max_attempts)
+                counts["failed"] += 1
+                continue
+
+            if complete_stage(conn, client_id, stage, worker_id, output, input_hash):
+                counts["done"] += 1
+            else:
+                counts["lost"] += 1
+    finally:
+        parser.close()
+        if text_index is not None:
+            text_index.close()
+
+    return counts
+
+
+def _worker_process(db_path: str, out_dir: str, lease_seconds: float, max_attempts: int) -> Dict[str, int]:
+    conn = open_job_store(db_path)
+    try:
+        return run_worker(conn, out_dir, lease_seconds=lease_seconds, max_attempts=max_attempts)
+    finally:
+        conn.close()
+
+
+def run_workers(
+    db_path: str,
+    out_dir: str,
+    processes: int = 1,
+    lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+) -> Dict[str, int]:
+    """Run `processes` independent workers against the same store and sum their counts."""
+    args = [(db_path, out_dir, lease_seconds, max_attempts)] * max(1, processes)
+    if processes <= 1:
+        results = [_worker_process(*args[0])]
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.starmap(_worker_process, args)
+    total = {"done": 0, "failed": 0, "lost": 0}
+    for r in results:
+        for k, v in r.items():
+            total[k] += v
+    return total
+
+
+def reset_failed(conn: sqlite3.Connection, stages: Iterable[str] = STAGES) -> int:
+    """
+    Put failed stages (and failed documents) back in the queue. Clients with
+    failed documents get their parse stage and everything after it re-queued,
+    whatever state those stages are in, unless a worker holds them right now.
+    Returns the number of stages re-queued.
+    """
+    stages = list(stages)
+    marks = ",".join("?" * len(stages))
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        requeued = 0
+        if "parse" in stages:
+            clients = [
+                r["client_id"] for r in conn.execute(
+                    "SELECT DISTINCT client_id FROM documents WHERE status='failed'"
+                )
+            ]
+            conn.execute("UPDATE documents SET status='pending', error=NULL, updated_at=? WHERE status='failed'", (now,))
+            for client_id in clients:
+                requeued += conn.execute(
+                    "UPDATE stages SET status='pending', output=NULL, error=NULL, attempts=0, "
+                    "lease_owner=NULL, lease_expires=NULL, updated_at=? "
+                    "WHERE client_id=? AND status != 'leased'",
+                    (now, client_id),
+                ).rowcount
+        requeued += conn.execute(
+            f"UPDATE stages SET status='pending', attempts=0, error=NULL, updated_at=? "
+            f"WHERE status='failed' AND stage IN ({marks})",
+            [now] + stages,
+        ).rowcount
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return requeued
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Resumable batch processing of tax returns.")
+    parser.add_argument("db", help="Path to the SQLite job store")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_enq = sub.add_parser("enqueue", help="Add or refresh clients from a JSON manifest")
+    p_enq.add_argument("manifest")
+
+    p_work = sub.add_parser("work", help="Process runnable stages until the queue is drained")
+    p_work.add_argument("--out-dir", default="out")
+    p_work.add_argument("--processes", type=int, default=1)
+    p_work.add_argument("--lease-seconds", type=float, default=DEFAULT_LEASE_SECONDS)
+    p_work.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS)
+
+    sub.add_parser("status", help="Show per-stage status counts")
+
+    p_retry = sub.add_parser("retry", help="Re-queue failed stages and documents")
+    p_retry.add_argument("--stage", action="append", choices=STAGES)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "work":
+        counts = run_workers(
+            args.db, args.out_dir, args.processes, args.lease_seconds, args.max_attempts
+        )
+        print(json.dumps(counts))
+        return
+
+    conn = open_job_store(args.db)
+    try:
+        if args.command == "enqueue":
+            n = enqueue_manifest(conn, load_manifest(args.manifest))
+            print(f"Queued {n} client(s) for (re)processing")
+        elif args.command == "status":
+            print(json.dumps(status_counts(conn), indent=2))
+        elif args.command == "retry":
+            n = reset_failed(conn, args.stage or STAGES)
+            print(f"Re-queued {n} failed stage(s)")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,434 @@
+# logic/load_test.py
+#
+# End-to-end concurrent load test for the return pipeline:
+#     parse_documents → compute_tax_summary → generate_form_1040
+#
+# Simulates N preparers uploading at once (closed loop: each virtual preparer
+# sends its next request as soon as the previous one finishes) and reports
+# p50/p95/p99 latency, throughput, and CPU / RSS sampled over time.
+#
+#   python -m logic.load_test \
+#       --docs text=samples/text --docs scanned=samples/scanned --docs multipage=samples/multi \
+#       --mix text=0.7,scanned=0.2,multipage=0.1 --concurrency 50 --requests 500
+#
+# Targets: the in-process pipeline (threads or a process pool), any Python
+# callable via --entry module:function, or an HTTP service via --url.
+import argparse
+import importlib
+import io
+import json
+import math
+import os
+import random
+import threading
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import psutil
+except ImportError:  # falls back to /proc (or, off Linux, os.times()) for sampling
+    psutil = None
+
+# (filename, bytes) pairs make up one request / upload
+Upload = List[Tuple[str, bytes]]
+
+
+# ---------------------------
+# Targets
+# ---------------------------
+def run_pipeline(files: Upload, filing_status: str = "single") -> Dict[str, Any]:
+    """The app's processing path, without Streamlit."""
+    from logic.parse_documents import parse_documents
+    from logic.tax_2024 import compute_tax_summary_cents, income_cents_from_summary
+    from logic.money import cents_dict_to_dollars
+    from logic.generate_form1040 import generate_form_1040
+
+    handles = []
+    for name, data in files:
+        f = io.BytesIO(data)
+        f.name = name
+        handles.append(f)
+
+    parsed = parse_documents(handles)
+    s = parsed["summary_cents"]
+    calc = cents_dict_to_dollars(compute_tax_summary_cents(
+        income_cents=income_cents_from_summary(s),
+        withholding_cents=s["withholding"]["federal"],
+        filing_status=filing_status,
+    ))
+    pdf = generate_form_1040(calc, filing_status, "Load Test", "000-00-0000", "1 Test St")
+    return {"documents": len(parsed["documents"]), "pdf_bytes": len(pdf)}
+
+
+def load_entry(spec: str) -> Callable[[Upload], Any]:
+    """'package.module:function' → callable taking a list of (filename, bytes)."""
+    module_name, _, func_name = spec.partition(":")
+    if not func_name:
+        raise ValueError("--entry must look like module:function")
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def _call_entry(spec: str, files: Upload) -> Any:
+    # Runs inside pool workers, so the entry point is resolved there.
+    return load_entry(spec)(files)
+
+
+def post_upload(url: str, files: Upload, timeout: float = 300.0) -> int:
+    """POST the files as multipart/form-data (field name "files"); returns the status code."""
+    boundary = uuid.uuid4().hex
+    body = io.BytesIO()
+    for name, data in files:
+        body.write(f"--{boundary}\r\n".encode())
+        body.write(f'Content-Disposition: form-data; name="files"; filename="{name}"\r\n'.encode())
+        body.write(b"Content-Type: application/pdf\r\n\r\n")
+        body.write(data)
+        body.write(b"\r\n")
+    body.write(f"--{boundary}--\r\n".encode())
+    req = urllib.request.Request(
+        url, data=body.getvalue(), method="POST",
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+    )
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        resp.read()
+        return resp.status
+
+
+# ---------------------------
+# Workload
+# ---------------------------
+def load_corpus(doc_specs: List[str]) -> Dict[str, List[Tuple[str, bytes]]]:
+    """['text=dir', 'scanned=dir', ...] → {kind: [(filename, bytes), ...]}"""
+    corpus: Dict[str, List[Tuple[str, bytes]]] = {}
+    for spec in doc_specs:
+        kind, _, path = spec.partition("=")
+        if not path:
+            raise ValueError(f"--docs expects KIND=DIR, got {spec!r}")
+        files = sorted(Path(path).glob("*.pdf")) if Path(path).is_dir() else [Path(path)]
+        corpus.setdefault(kind, []).extend((p.name, p.read_bytes()) for p in files)
+        if not corpus[kind]:
+            raise ValueError(f"No PDFs found for {kind!r} in {path}")
+    return corpus
+
+
+def parse_mix(mix: Optional[str], kinds: List[str]) -> Dict[str, float]:
+    if not mix:
+        return {k: 1.0 for k in kinds}
+    weights = {}
+    for part in mix.split(","):
+        kind, _, w = part.partition("=")
+        kind = kind.strip()
+        if kind not in kinds:
+            raise ValueError(f"--mix names {kind!r}, which has no --docs")
+        weights[kind] = float(w)
+    return weights
+
+
+def make_request(rng: random.Random, corpus, weights: Dict[str, float], docs_per_request: int):
+    kinds = list(weights)
+    picked = rng.choices(kinds, weights=[weights[k] for k in kinds], k=docs_per_request)
+    return picked, [rng.choice(corpus[k]) for k in picked]
+
+
+# ---------------------------
+# Resource sampling
+# ---------------------------
+def _rss_mb_fallback() -> float:
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+def _proc_table() -> Dict[int, Tuple[int, float, float]]:
+    """pid → (parent pid, CPU seconds, RSS MB) for every process in /proc."""
+    table: Dict[int, Tuple[int, float, float]] = {}
+    tick, page = os.sysconf("SC_CLK_TCK"), os.sysconf("SC_PAGE_SIZE")
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat") as fh:
+                raw = fh.read()
+            # fields after "pid (comm)": state ppid ... utime(11) stime(12) ... rss(21)
+            fields = raw[raw.rfind(")") + 2:].split()
+            table[int(name)] = (
+                int(fields[1]),
+                (int(fields[11]) + int(fields[12])) / tick,
+                int(fields[21]) * page / 1e6,
+            )
+        except (OSError, ValueError, IndexError):
+            continue
+    return table
+
+
+def _proc_tree_usage(root: int) -> Tuple[float, float]:
+    """(CPU seconds, RSS MB) of `root` and all its live descendants, read from /proc."""
+    table = _proc_table()
+    children: Dict[int, List[int]] = {}
+    for pid, (ppid, _, _) in table.items():
+        children.setdefault(ppid, []).append(pid)
+    cpu = rss = 0.0
+    stack = [root] if root in table else []
+    while stack:
+        pid = stack.pop()
+        _, pid_cpu, pid_rss = table[pid]
+        cpu += pid_cpu
+        rss += pid_rss
+        stack.extend(children.get(pid, ()))
+    return cpu, rss
+
+
+class ResourceSampler(threading.Thread):
+    """
+    Samples CPU% and RSS (this process plus its children, e.g. process-pool
+    workers) every `interval` seconds, via psutil or else /proc. Where neither
+    is available, os.times() only covers children that have already exited
+    and RSS is this process alone; `includes_children` is then False.
+    """
+
+    def __init__(self, interval: float = 1.0):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples: List[Dict[str, float]] = []
+        self._halt = threading.Event()
+        self._proc = psutil.Process() if psutil else None
+        if self._proc is not None:
+            self.source = "psutil"
+        elif os.path.isdir("/proc"):
+            self.source = "proc"
+        else:
+            self.source = "os.times"
+        self.includes_children = self.source != "os.times"
+
+    def _usage(self) -> Tuple[float, float]:
+        """(CPU seconds, RSS MB) so far."""
+        if self._proc is not None:
+            cpu = rss = 0.0
+            for proc in [self._proc] + self._proc.children(recursive=True):
+                try:
+                    cpu += sum(proc.cpu_times()[:2])
+                    rss += proc.memory_info().rss / 1e6
+                except psutil.Error:
+                    pass
+            return cpu, rss
+        if self.source == "proc":
+            return _proc_tree_usage(os.getpid())
+        t = os.times()
+        return t.user + t.system + t.children_user + t.children_system, _rss_mb_fallback()
+
+    def run(self):
+        start = last_t = time.perf_counter()
+        last_cpu, _ = self._usage()
+        while not self._halt.wait(self.interval):
+            now, (cpu, rss) = time.perf_counter(), self._usage()
+            self.samples.append({
+                "t": round(now - start, 2),
+                # a child that exits between samples takes its CPU time with it
+                "cpu_percent": round(max(0.0, 100.0 * (cpu - last_cpu) / (now - last_t)), 1),
+                "rss_mb": round(rss, 1),
+            })
+            last_t, last_cpu = now, cpu
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+
+# ---------------------------
+# Runner
+# ---------------------------
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    vals = sorted(latencies)
+    return {
+        "count": len(vals),
+        "mean": round(sum(vals) / len(vals), 4) if vals else 0.0,
+        "p50": round(percentile(vals, 50), 4),
+        "p95": round(percentile(vals, 95), 4),
+        "p99": round(percentile(vals, 99), 4),
+        "max": round(vals[-1], 4) if vals else 0.0,
+    }
+
+
+def run_load_test(
+    corpus: Dict[str, List[Tuple[str, bytes]]],
+    weights: Dict[str, float],
+    concurrency: int = 10,
+    requests: int = 100,
+    duration: Optional[float] = None,
+    docs_per_request: int = 1,
+    mode: str = "thread",
+    entry: Optional[str] = None,
+    url: Optional[str] = None,
+    warmup: int = 0,
+    sample_interval: float = 1.0,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    Drive `concurrency` closed-loop virtual preparers until `requests` have been
+    sent (or `duration` seconds elapsed) and return the latency/resource report.
+    Throughput is measured from the first request after the `warmup` ones.
+    """
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+    pool = ProcessPoolExecutor(max_workers=concurrency) if mode == "process" and not url else None
+
+    def call(files: Upload):
+        if url:
+            return post_upload(url, files)
+        if pool is not None:
+            if entry:
+                return pool.submit(_call_entry, entry, files).result()
+            return pool.submit(run_pipeline, files).result()
+        return load_entry(entry)(files) if entry else run_pipeline(files)
+
+    results: List[Tuple[List[str], float, Optional[str]]] = []
+    results_lock = threading.Lock()
+    issued = [0]
+    deadline = [None]
+    measure_start = [None]
+
+    def worker():
+        while True:
+            with rng_lock:
+                if issued[0] >= requests + warmup:
+                    return
+                if deadline[0] is not None and time.perf_counter() >= deadline[0]:
+                    return
+                idx = issued[0]
+                issued[0] += 1
+                if idx == warmup:
+                    measure_start[0] = time.perf_counter()
+                kinds, files = make_request(rng, corpus, weights, docs_per_request)
+            t0 = time.perf_counter()
+            error = None
+            try:
+                call(files)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            elapsed = time.perf_counter() - t0
+            if idx >= warmup:
+                with results_lock:
+                    results.append((kinds, elapsed, error))
+
+    sampler = ResourceSampler(sample_interval)
+    sampler.start()
+    start = time.perf_counter()
+    if duration:
+        deadline[0] = start + duration
+        requests = 1 << 62   # bounded by the deadline instead
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    end = time.perf_counter()
+    wall = end - start
+    measured = end - measure_start[0] if measure_start[0] is not None else 0.0
+    sampler.stop()
+    if pool is not None:
+        pool.shutdown()
+
+    ok = [lat for _, lat, err in results if err is None]
+    by_kind: Dict[str, List[float]] = {}
+    for kinds, lat, err in results:
+        if err is None:
+            for k in set(kinds):
+                by_kind.setdefault(k, []).append(lat)
+    errors: Dict[str, int] = {}
+    for _, _, err in results:
+        if err is not None:
+            errors[err] = errors.get(err, 0) + 1
+
+    return {
+        "config": {
+            "concurrency": concurrency,
+            "mode": "http" if url else mode,
+            "target": url or entry or "pipeline",
+            "docs_per_request": docs_per_request,
+            "mix": weights,
+            "warmup": warmup,
+        },
+        "wall_seconds": round(wall, 3),
+        "measured_seconds": round(measured, 3),   # wall time after warmup
+        "requests": len(results),
+        "errors": errors,
+        "throughput_rps": round(len(ok) / measured, 3) if measured > 0 else 0.0,
+        "latency_seconds": latency_summary(ok),
+        "latency_by_kind": {k: latency_summary(v) for k, v in by_kind.items()},
+        "resources": {
+            "source": sampler.source,
+            "includes_children": sampler.includes_children,
+            "peak_rss_mb": max((s["rss_mb"] for s in sampler.samples), default=0.0),
+            "mean_cpu_percent": round(
+                sum(s["cpu_percent"] for s in sampler.samples) / len(sampler.samples), 1
+            ) if sampler.samples else 0.0,
+            "timeseries": sampler.samples,
+        },
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Concurrent end-to-end load test for the return pipeline.")
+    parser.add_argument("--docs", action="append", required=True, metavar="KIND=DIR",
+                        help="Sample documents of one kind (directory of PDFs or a single PDF); repeatable")
+    parser.add_argument("--mix", help="Relative weights, e.g. text=0.7,scanned=0.2,multipage=0.1")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--duration", type=float, help="Run for this many seconds instead of --requests")
+    parser.add_argument("--docs-per-request", type=int, default=1)
+    parser.add_argument("--mode", choices=("thread", "process"), default="thread")
+    parser.add_argument("--entry", help="Target callable as module:function (receives [(filename, bytes)])")
+    parser.add_argument("--url", help="POST uploads to this HTTP endpoint instead of calling in-process")
+    parser.add_argument("--warmup", type=int, default=0, help="Requests to send before measuring")
+    parser.add_argument("--sample-interval", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the full report (with timeseries) here")
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.docs)
+    report = run_load_test(
+        corpus,
+        parse_mix(args.mix, list(corpus)),
+        concurrency=args.concurrency,
+        requests=args.requests,
+        duration=args.duration,
+        docs_per_request=args.docs_per_request,
+        mode=args.mode,
+        entry=args.entry,
+        url=args.url,
+        warmup=args.warmup,
+        sample_interval=args.sample_interval,
+        seed=args.seed,
+    )
+
+    lat = report["latency_seconds"]
+    print(f"{report['requests']} requests in {report['measured_seconds']}s "
+          f"({report['throughput_rps']} req/s, {sum(report['errors'].values())} errors)")
+    print(f"latency p50={lat['p50']}s p95={lat['p95']}s p99={lat['p99']}s max={lat['max']}s")
+    for kind, k_lat in report["latency_by_kind"].items():
+        print(f"  {kind:>10}: p50={k_lat['p50']}s p95={k_lat['p95']}s p99={k_lat['p99']}s (n={k_lat['count']})")
+    res = report["resources"]
+    print(f"cpu mean={res['mean_cpu_percent']}%  peak rss={res['peak_rss_mb']} MB")
+    if not res["includes_children"]:
+        print(f"  (sampled with {res['source']}: running worker processes are not included)")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+# logic/mapping_plan.py
+#
+# One declarative source-document → Form 1040 mapping.
+#
+# MAPPING below is the single place that says which parsed box feeds which
+# 1040 key. It is compiled once at import into per-form tuples, so mapping a
+# return is a single pass over its documents: amounts are summed in integer
+# cents across every document of a form type (two W-2s → one line 1a) and
+# text fields take the first non-missing value.
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from logic.form1040_model import Form1040Batch, new_form1040
+from logic.money import cents_to_dollars, parse_cents
+
+AMOUNT, TEXT = "amount", "text"
+
+# Canonical form types are the ones parse_documents() puts in "form_type".
+FORM_ALIASES = {
+    "w2": "W-2",
+    "w-2": "W-2",
+    "1099-int": "1099-INT",
+    "1099int": "1099-INT",
+    "1099-nec": "1099-NEC",
+    "1099nec": "1099-NEC",
+}
+
+
+def _first_two_words(value: str) -> str:
+    return " ".join(value.split()[:2])
+
+
+# (form type, parsed field, 1040 key, kind[, transform])
+MAPPING: Tuple[tuple, ...] = (
+    # W-2
+    ("W-2", "a_employee_ssn", "taxpayer_ssn", TEXT),
+    ("W-2", "e_employee_name_address_zip", "taxpayer_name", TEXT, _first_two_words),
+    ("W-2", "e_employee_name_address_zip", "address_line", TEXT),
+    ("W-2", "a_employee_ssn", "employee_ssn", TEXT),
+    ("W-2", "b_employer_ein", "employer_ein", TEXT),
+    ("W-2", "c_employer_name_address_zip", "employer_name_address", TEXT),
+    ("W-2", "e_employee_name_address_zip", "employee_name_address", TEXT),
+    ("W-2", "1_wages_tips_other_comp", "line1a_wages", AMOUNT),
+    ("W-2", "2_federal_income_tax_withheld", "line25a_withheld_w2", AMOUNT),
+    ("W-2", "3_social_security_wages", "w2_box3_social_security_wages", AMOUNT),
+    ("W-2", "4_social_security_tax_withheld", "w2_box4_social_security_tax", AMOUNT),
+    ("W-2", "5_medicare_wages_and_tips", "w2_box5_medicare_wages", AMOUNT),
+    ("W-2", "6_medicare_tax_withheld", "w2_box6_medicare_tax", AMOUNT),
+    ("W-2", "17_state_income_tax", "state_income_tax", AMOUNT),
+    ("W-2", "14_other", "other_withholding", AMOUNT),
+    # 1099-INT
+    ("1099-INT", "payer_name_address", "payer_name_1099int", TEXT),
+    ("1099-INT", "payer_tin", "payer_tin_1099int", TEXT),
+    ("1099-INT", "box_1_interest_income", "line2b_taxable_interest", AMOUNT),
+    ("1099-INT", "box_8_tax_exempt_interest", "line2a_tax_exempt_interest", AMOUNT),
+    ("1099-INT", "box_3_us_savings_bonds_interest", "interest_us_savings", AMOUNT),
+    ("1099-INT", "box_6_foreign_tax_paid", "foreign_tax_paid", AMOUNT),
+    ("1099-INT", "box_4_federal_income_tax_withheld", "line25b_estimated", AMOUNT),
+    # 1099-NEC
+    ("1099-NEC", "payer_name_address", "payer_name_1099nec", TEXT),
+    ("1099-NEC", "payer_tin", "payer_tin_1099nec", TEXT),
+    ("1099-NEC", "box_1_nonemployee_compensation", "line8_other_income", AMOUNT),
+    ("1099-NEC", "box_7_state_income", "nec_state_income", AMOUNT),
+    ("1099-NEC", "box_4_federal_income_tax_withheld", "line25b_estimated", AMOUNT),
+)
+
+# 1040 totals derived from mapped amounts: key → summed keys
+DERIVED: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("line9_total_income", ("line1a_wages", "line2b_taxable_interest", "line8_other_income")),
+    ("line25d_total_payments", ("line25a_withheld_w2", "line25b_estimated", "line25c_refundable_credits")),
+)
+
+_MISSING = (None, "", "missing")
+
+
+# ---------------------------
+# Compilation (runs once at import)
+# ---------------------------
+FieldStep = Tuple[str, str, Optional[Callable[[str], str]]]
+
+
+def _compile(mapping):
+    amounts: Dict[str, List[Tuple[str, str]]] = {}
+    texts: Dict[str, List[FieldStep]] = {}
+    for row in mapping:
+        form, src, dst, kind = row[:4]
+        transform = row[4] if len(row) > 4 else None
+        if kind == AMOUNT:
+            amounts.setdefault(form, []).append((src, dst))
+        elif kind == TEXT:
+            texts.setdefault(form, []).append((src, dst, transform))
+        else:
+            raise ValueError(f"Unknown mapping kind {kind!r} for {form} {src}")
+    forms = set(amounts) | set(texts)
+    return {form: (tuple(amounts.get(form, ())), tuple(texts.get(form, ()))) for form in forms}
+
+
+PLAN = _compile(MAPPING)
+AMOUNT_TARGETS = tuple(dict.fromkeys(row[2] for row in MAPPING if row[3] == AMOUNT))
+
+
+def canonical_form(name: Optional[str]) -> Optional[str]:
+    if not name:
+        return None
+    return FORM_ALIASES.get(name.strip().lower(), name)
+
+
+def iter_documents(parsed: Any) -> Iterable[Tuple[Optional[str], Dict[str, Any]]]:
+    """
+    Yield (canonical form type, document) from any of the shapes in use:
+      - a parse_documents() payload (uses "document_list" when present, so
+        every uploaded form counts, else "documents")
+      - a documents dict keyed by form type, whose values are one document or
+        a list of them
+      - a plain list of documents
+    """
+    if isinstance(parsed, dict):
+        if "document_list" in parsed:
+            parsed = parsed["document_list"]
+        elif "documents" in parsed:
+            parsed = parsed["documents"]
+    if isinstance(parsed, dict):
+        for key, docs in parsed.items():
+            for doc in docs if isinstance(docs, list) else (docs,):
+                if doc:
+                    yield canonical_form(doc.get("form_type") or key), doc
+    else:
+        for doc in parsed or ():
+            if doc:
+                yield canonical_form(doc.get("form_type")), doc
+
+
+# ---------------------------
+# Mapping
+# ---------------------------
+def map_documents_cents(parsed: Any) -> Dict[str, Any]:
+    """
+    Apply the mapping plan. Amount keys are integer cents (present whenever a
+    document of the source form was seen, 0 if its box was missing), text keys
+    are strings, and the DERIVED totals are always included.
+    """
+    out: Dict[str, Any] = {}
+    for form, doc in iter_documents(parsed):
+        steps = PLAN.get(form)
+        if steps is None:
+            continue
+        amount_steps, text_steps = steps
+        pf = doc.get("parsed_fields") or {}
+        cents = doc.get("amounts_cents") or {}
+
+        for src, dst in amount_steps:
+            c = cents.get(src)
+            if c is None:
+                c = parse_cents(pf.get(src), 0)
+            out[dst] = out.get(dst, 0) + c
+
+        for src, dst, transform in text_steps:
+            if dst in out:
+                continue
+            v = pf.get(src)
+            if v in _MISSING:
+                continue
+            out[dst] = transform(v) if transform else v
+
+    for dst, parts in DERIVED:
+        out[dst] = sum(out.get(p, 0) for p in parts)
+    return out
+
+
+_DERIVED_KEYS = frozenset(dst for dst, _ in DERIVED)
+_CENTS_KEYS = frozenset(AMOUNT_TARGETS) | _DERIVED_KEYS
+
+
+def map_documents(parsed: Any) -> Dict[str, Any]:
+    """map_documents_cents() with amounts converted to dollars for the form."""
+    return {k: cents_to_dollars(v) if k in _CENTS_KEYS else v for k, v in map_documents_cents(parsed).items()}
+
+
+def map_documents_batch(payloads: Iterable[Any], batch: Optional[Form1040Batch] = None) -> Form1040Batch:
+    """Map many parsed returns straight into a Form1040Batch column store (template defaults filled in)."""
+    if batch is None:
+        batch = Form1040Batch()
+    for parsed in payloads:
+        form = new_form1040()
+        form.update(map_documents(parsed))
+        batch.append(form)
+    return batch
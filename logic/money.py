@@ -0,0 +1,90 @@
+# logic/money.py
+#
+# Fixed-point money: every amount is an int number of cents.
+#
+# Amounts are parsed from document text exactly once (parse_cents) and stay
+# integers through summary totals and the tax engine; they only become
+# strings / float dollars again at the display edge (format_cents,
+# cents_to_dollars). Integer cents never drift and sum exactly.
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Dict, Iterable, List, Optional
+
+Cents = int
+
+_STRIP = str.maketrans("", "", "$, \t")
+
+
+def parse_cents(value: Any, default: Optional[Cents] = None) -> Optional[Cents]:
+    """
+    Convert an amount to integer cents.
+
+      "12,345.00" → 1234500     "$1,234.5" → 123450     "(12.00)" → -1200
+      12.5 (float dollars) → 1250     "missing" / "" / None → default
+
+    Fractions beyond a cent are rounded half-up.
+    """
+    if value is None or isinstance(value, bool):
+        return default
+    if isinstance(value, int):
+        return value * 100
+    if isinstance(value, float):
+        if value != value:   # NaN
+            return default
+        return dollars_to_cents(value)
+
+    s = str(value).strip()
+    if not s or s == "missing":
+        return default
+
+    neg = False
+    if s[0] == "(" and s[-1] == ")":
+        neg, s = True, s[1:-1]
+    s = s.translate(_STRIP)
+    if s[:1] in ("-", "+"):
+        neg, s = neg or s[0] == "-", s[1:]
+
+    whole, _, frac = s.partition(".")
+    if not (whole or frac) or (whole and not whole.isdigit()) or (frac and not frac.isdigit()):
+        return default
+
+    cents = int(whole or "0") * 100
+    if len(frac) <= 2:
+        cents += int(frac.ljust(2, "0") or "0")
+    else:
+        cents += int(frac[:2]) + (1 if frac[2] >= "5" else 0)
+    return -cents if neg else cents
+
+
+def parse_cents_many(values: Iterable[Any], default: Optional[Cents] = None) -> List[Optional[Cents]]:
+    """Bulk parse_cents() over a column of values."""
+    return [parse_cents(v, default) for v in values]
+
+
+def dollars_to_cents(amount: float) -> Cents:
+    """Float dollars → cents, rounding the shortest decimal repr half-up (no binary drift)."""
+    return int(Decimal(repr(float(amount))).scaleb(2).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def cents_to_dollars(cents: Cents) -> float:
+    return cents / 100
+
+
+def format_cents(cents: Cents) -> str:
+    """1234500 → "12345.00" (same shape as the parsers' amount strings)."""
+    sign = "-" if cents < 0 else ""
+    whole, frac = divmod(abs(cents), 100)
+    return f"{sign}{whole}.{frac:02d}"
+
+
+def format_cents_many(values: Iterable[Optional[Cents]], missing: str = "missing") -> List[str]:
+    """Bulk format_cents(); None becomes the `missing` sentinel."""
+    return [missing if v is None else format_cents(v) for v in values]
+
+
+def apply_rate(cents: Cents, rate_bp: int) -> Cents:
+    """cents × (rate_bp / 10000), rounded half-up, in pure integer arithmetic."""
+    return (cents * rate_bp + 5000) // 10000
+
+
+def cents_dict_to_dollars(values: Dict[str, Cents]) -> Dict[str, float]:
+    return {k: cents_to_dollars(v) for k, v in values.items()}
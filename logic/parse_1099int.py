@@ -1,13 +1,59 @@
 import io
 import re
 from typing import Dict, Any
-import fitz  # PyMuPDF
+
+from logic import backends
 
 CURRENCY_RE = re.compile(r"\d{1,3}(?:,\d{3})*(?:\.\d{2})?")
 
+# Every field parse_1099int() may report in parsed_fields
+INT_1099_FIELDS = (
+    "payer_name_address",
+    "payer_tin",
+    "recipient_tin",
+    "recipient_name_address",
+    "account_number",
+    "payer_rtn",
+    "box_1_interest_income",
+    "box_2_early_withdrawal_penalty",
+    "box_3_us_savings_bonds_interest",
+    "box_4_federal_income_tax_withheld",
+    "box_5_investment_expenses",
+    "box_6_foreign_tax_paid",
+    "box_7_foreign_country",
+    "box_8_tax_exempt_interest",
+    "box_9_specified_private_activity_bond_interest",
+    "box_10_market_discount",
+    "box_11_bond_premium",
+    "box_12_bond_premium_treasury",
+    "box_13_bond_premium_tax_exempt",
+    "box_14_tax_exempt_tax_credit_bond_no",
+    "box_15_state",
+    "box_16_state_identification_no",
+    "box_17_state_tax_withheld",
+)
+
+# Fields that hold dollar amounts
+INT_1099_AMOUNT_FIELDS = frozenset({
+    "box_1_interest_income",
+    "box_2_early_withdrawal_penalty",
+    "box_3_us_savings_bonds_interest",
+    "box_4_federal_income_tax_withheld",
+    "box_5_investment_expenses",
+    "box_6_foreign_tax_paid",
+    "box_8_tax_exempt_interest",
+    "box_9_specified_private_activity_bond_interest",
+    "box_10_market_discount",
+    "box_11_bond_premium",
+    "box_12_bond_premium_treasury",
+    "box_13_bond_premium_tax_exempt",
+    "box_17_state_tax_withheld",
+})
+
 def _extract_text(file_bytes: bytes) -> str:
     """Extract visible text from PDF using PyMuPDF."""
     text = ""
+    (fitz,) = backends.require("pymupdf")   # imported on first use; BackendUnavailable if disabled
     with fitz.open(stream=file_bytes, filetype="pdf") as doc:
         for page in doc:
             text += page.get_text("text") + "\n"
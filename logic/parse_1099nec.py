@@ -18,6 +18,15 @@ HARD_CODED_1099NEC = {
     "box_7_state_income": "12345.00"
 }
 
+# Fields that hold dollar amounts
+NEC_1099_AMOUNT_FIELDS = frozenset({
+    "box_1_nonemployee_compensation",
+    "box_3_other_income",
+    "box_4_federal_income_tax_withheld",
+    "box_5_state_tax_withheld",
+    "box_7_state_income",
+})
+
 def parse_1099nec(file_bytes: bytes, filename: str) -> Dict[str, Any]:
     """
     STUB: Always return the predefined 1099-NEC values regardless of input.
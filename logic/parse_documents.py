@@ -1,51 +1,219 @@
+import asyncio
 import io
 import re
-from typing import List, Dict, Any
-import pdfplumber
-import fitz  # PyMuPDF
-from PIL import Image
-import pytesseract
+import sqlite3
+import time
+from collections import Counter
+from typing import List, Dict, Any, AsyncIterator, Iterable, Iterator, Optional, Tuple, Union
+
+# Heavy PDF / OCR libraries are imported on first use through the backend registry
+from logic import backends
 
 # Dedicated 1099 parsers
-from logic.parse_1099int import parse_1099int
-from logic.parse_1099nec import parse_1099nec
+from logic.parse_1099int import parse_1099int, INT_1099_AMOUNT_FIELDS
+from logic.parse_1099nec import parse_1099nec, NEC_1099_AMOUNT_FIELDS
+from logic.budgets import DocumentBudget, DocumentFailed, IsolatedParser
+from logic.money import Cents, cents_to_dollars, parse_cents
+from logic.text_index import index_document, open_text_index_from_env
+from logic.dedup import DuplicateIndex, duplicate_pages, page_fingerprints
+from logic.w2_checks import ACCEPT_SCORE, summarize_attempt
 
 
 # ---------------------------
-# Text extraction (pdfplumber → PyMuPDF → OCR fallback)
+# Text extraction: per-page strategy chosen by a cheap PyMuPDF probe
+#
+#   "text"   → the page's own text layer (PyMuPDF, already read by the probe)
+#   "layout" → pdfplumber, for pages with a sparse / fragmented text layer
+#   "ocr"    → Tesseract, for pages with no usable text layer (scans)
+#
+# Backends disabled via TAXRETURN_BACKENDS (or not installed) are skipped.
 # ---------------------------
-def extract_text_from_pdf(file_bytes: bytes) -> str:
-    text = ""
+TEXT_LAYER_MIN_DENSITY = 1.0     # text-layer chars per square inch to trust it as-is
+SCANNED_IMAGE_COVERAGE = 0.5     # image area / page area above which a sparse page counts as scanned
+OCR_DPI = 450
+
+# Process-wide decision counters: pages per strategy, documents, fallbacks
+EXTRACTION_STATS: Counter = Counter()
+
+
+def _image_coverage(page) -> float:
+    """Fraction of the page covered by raster images (a full-page scan is ~1.0)."""
     try:
-        with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
-            for page in pdf.pages:
-                text += page.extract_text() or ""
+        fitz = backends.module("fitz")
+        area = abs(page.rect)
+        covered = sum(abs(page.rect & fitz.Rect(info["bbox"])) for info in page.get_image_info())
+        return min(1.0, covered / area) if area else 0.0
     except Exception:
-        pass
+        return 0.0
 
-    if len(text.strip()) < 20:
-        try:
-            doc = fitz.open(stream=file_bytes, filetype="pdf")
-            for page in doc:
-                text += page.get_text() or ""
-        except Exception:
-            pass
 
-    if len(text.strip()) < 20:
+def choose_page_strategy(page, probe_text: str) -> str:
+    """Pick "text", "layout" or "ocr" for one page from its text-layer density."""
+    chars = len(probe_text.strip())
+    square_inches = abs(page.rect) / (72.0 * 72.0)
+    if square_inches and chars / square_inches >= TEXT_LAYER_MIN_DENSITY:
+        return "text"
+    if chars and _image_coverage(page) < SCANNED_IMAGE_COVERAGE:
+        return "layout"
+    return "ocr"
+
+
+def _render_allowed(budget: Optional[DocumentBudget], rect, dpi: int) -> bool:
+    return budget is None or budget.allow_pixels(rect.width * dpi / 72.0, rect.height * dpi / 72.0)
+
+
+def _tesseract(budget: Optional[DocumentBudget], call, img, **kwargs):
+    """Run one pytesseract call under the document's OCR / wall-time budget."""
+    if budget is None:
+        return call(img, **kwargs)
+    timeout = budget.ocr_timeout()
+    if timeout == 0:
+        raise TimeoutError("OCR budget exhausted")
+    t0 = time.perf_counter()
+    try:
+        return call(img, timeout=timeout or 0, **kwargs)
+    finally:
+        budget.charge_ocr(time.perf_counter() - t0)
+
+
+def _ocr_page(page, budget: Optional[DocumentBudget] = None) -> Tuple[str, List[str]]:
+    """
+    OCR one page. Returns its text and the words in its top-left quadrant
+    (W-2 Copy B) in reading order, so the W-2 ladder can reuse this pass.
+    """
+    _, Image, pytesseract = backends.require("ocr")
+    if not _render_allowed(budget, page.rect, OCR_DPI):
+        raise TimeoutError("render budget exhausted")
+    pix = page.get_pixmap(dpi=OCR_DPI)
+    img = Image.open(io.BytesIO(pix.tobytes("png")))
+    data = _tesseract(
+        budget, pytesseract.image_to_data, img,
+        lang="eng", config="--oem 1 --psm 4", output_type=pytesseract.Output.DICT,
+    )
+    lines: Dict[Tuple[int, int, int], List[Tuple[int, str]]] = {}
+    copyb: List[Tuple[int, int, int, int, str]] = []
+    for i, t in enumerate(data["text"]):
+        t = t.strip()
+        if not t:
+            continue
+        line = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(line, []).append((data["word_num"][i], t))
+        if data["left"][i] < img.width / 2 and data["top"][i] < img.height / 2:
+            copyb.append(line + (data["word_num"][i], t))
+    text = "\n".join(" ".join(w for _, w in sorted(words)) for _, words in sorted(lines.items()))
+    copyb.sort()
+    return text, [w[4] for w in copyb]
+
+
+def _extract_text_whole_document(file_bytes: bytes) -> str:
+    """Legacy whole-document cascade, used only when PyMuPDF is unavailable."""
+    text = ""
+    if backends.is_enabled("pdfplumber"):
         try:
-            doc = fitz.open(stream=file_bytes, filetype="pdf")
-            ocr_text = ""
-            for i in range(len(doc)):
-                pix = doc[i].get_pixmap(dpi=450)
-                img = Image.open(io.BytesIO(pix.tobytes("png")))
-                part = pytesseract.image_to_string(img, lang="eng", config="--oem 1 --psm 4")
-                ocr_text += part + "\n"
-            text = ocr_text
+            (pdfplumber,) = backends.require("pdfplumber")
+            with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
+                for page in pdf.pages:
+                    text += page.extract_text() or ""
         except Exception:
-            text = ""
+            pass
     return text
 
 
+def extract_text_with_stats(
+    file_bytes: bytes,
+    skip_pages: Optional[Dict[int, int]] = None,
+    budget: Optional[DocumentBudget] = None,
+    ocr_tokens: Optional[Dict[int, List[str]]] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Extract text page by page, choosing the cheapest adequate backend per page.
+    Pages in `skip_pages` (repeats of an earlier page, see logic.dedup) are not
+    extracted at all and are recorded as "duplicate".
+    With a `budget`, extraction stops at max_pages / wall_seconds and OCR
+    falls back to the text layer once render or OCR budgets run out; check
+    budget.exceeded afterwards.
+    If `ocr_tokens` is given, the Copy B words of every OCR'd page are stored
+    in it by page index (see extract_w2_boxes).
+    Returns (text, stats): stats["decisions"] is the probe's choice per page and
+    stats["pages"] the strategy actually used (they differ when a backend is
+    disabled or failed).
+    """
+    stats: Dict[str, Any] = {"decisions": [], "pages": [], "fallbacks": 0}
+    EXTRACTION_STATS["documents"] += 1
+
+    if not backends.is_enabled("pymupdf"):
+        stats["pages"].append("layout")
+        EXTRACTION_STATS["layout"] += 1
+        return _extract_text_whole_document(file_bytes), stats
+
+    (fitz,) = backends.require("pymupdf")
+    try:
+        doc = fitz.open(stream=file_bytes, filetype="pdf")
+    except Exception:
+        return "", stats
+
+    layout_enabled = backends.is_enabled("pdfplumber")
+    ocr_enabled = backends.is_enabled("ocr")
+    plumber_pdf = None
+    parts: List[str] = []
+    try:
+        for i, page in enumerate(doc):
+            if skip_pages and i in skip_pages:
+                stats["decisions"].append("duplicate")
+                stats["pages"].append("duplicate")
+                EXTRACTION_STATS["duplicate"] += 1
+                continue
+            if budget is not None and not budget.allow_page():
+                stats["truncated_at_page"] = i
+                break
+            probe = page.get_text() or ""
+            strategy = choose_page_strategy(page, probe)
+            stats["decisions"].append(strategy)
+            EXTRACTION_STATS[f"probe_{strategy}"] += 1
+            text = probe
+
+            if strategy == "layout":
+                if layout_enabled:
+                    try:
+                        if plumber_pdf is None:
+                            (pdfplumber,) = backends.require("pdfplumber")
+                            plumber_pdf = pdfplumber.open(io.BytesIO(file_bytes))
+                        text = plumber_pdf.pages[i].extract_text() or probe
+                    except Exception:
+                        strategy, text = "text", probe
+                        stats["fallbacks"] += 1
+                else:
+                    strategy = "text"
+
+            elif strategy == "ocr":
+                if ocr_enabled:
+                    try:
+                        text, copyb = _ocr_page(page, budget)
+                        if ocr_tokens is not None:
+                            ocr_tokens[i] = copyb
+                    except Exception:
+                        strategy, text = "text", probe
+                        stats["fallbacks"] += 1
+                else:
+                    strategy = "text"
+
+            stats["pages"].append(strategy)
+            EXTRACTION_STATS[strategy] += 1
+            parts.append(text)
+    finally:
+        if plumber_pdf is not None:
+            plumber_pdf.close()
+        doc.close()
+
+    EXTRACTION_STATS["pages"] += len(stats["pages"])
+    EXTRACTION_STATS["fallbacks"] += stats["fallbacks"]
+    return "\n".join(parts), stats
+
+
+def extract_text_from_pdf(file_bytes: bytes) -> str:
+    return extract_text_with_stats(file_bytes)[0]
+
+
 def normalize_spaces(s: str) -> str:
     return re.sub(r"\s+", " ", s).strip()
 
@@ -56,6 +224,55 @@ def normalize_spaces(s: str) -> str:
 CURRENCY_RE = re.compile(r"\b\d{1,3}(?:[,\s]?\d{3})*(?:\.\d{2})\b")
 
 
+# Every W-2 box reported in parsed_fields, in output order
+W2_FIELDS = (
+    "a_employee_ssn",
+    "1_wages_tips_other_comp",
+    "2_federal_income_tax_withheld",
+    "b_employer_ein",
+    "3_social_security_wages",
+    "4_social_security_tax_withheld",
+    "5_medicare_wages_and_tips",
+    "6_medicare_tax_withheld",
+    "c_employer_name_address_zip",
+    "d_control_number",
+    "e_employee_name_address_zip",
+    "7_social_security_tips",
+    "8_allocated_tips",
+    "9_blank",
+    "10_dependent_care_benefits",
+    "11_nonqualified_plans",
+    "12a_d_codes",
+    "13_checkboxes",
+    "14_other",
+    "15_state_employer_id",
+    "16_state_wages_tips",
+    "17_state_income_tax",
+    "18_local_wages_tips",
+    "19_local_income_tax",
+    "20_locality_name",
+)
+
+
+# W-2 boxes that hold dollar amounts
+W2_AMOUNT_FIELDS = frozenset({
+    "1_wages_tips_other_comp",
+    "2_federal_income_tax_withheld",
+    "3_social_security_wages",
+    "4_social_security_tax_withheld",
+    "5_medicare_wages_and_tips",
+    "6_medicare_tax_withheld",
+    "7_social_security_tips",
+    "8_allocated_tips",
+    "10_dependent_care_benefits",
+    "11_nonqualified_plans",
+    "16_state_wages_tips",
+    "17_state_income_tax",
+    "18_local_wages_tips",
+    "19_local_income_tax",
+})
+
+
 def to_float_str(token: str) -> str:
     return token.replace(",", "").replace(" ", "")
 
@@ -64,11 +281,20 @@ def is_currency_token(tok: str) -> bool:
     return bool(CURRENCY_RE.fullmatch(tok))
 
 
-def extract_words_in_copyB(file_bytes: bytes) -> List[str]:
+def _page_limit(budget: Optional[DocumentBudget]) -> Optional[int]:
+    if budget is None or not budget.limits.get("max_pages"):
+        return None
+    return int(budget.limits["max_pages"])
+
+
+def extract_words_in_copyB(file_bytes: bytes, budget: Optional[DocumentBudget] = None) -> List[str]:
     """Return tokens (words) from only the top-left quadrant (Copy B) of each page."""
     tokens: List[str] = []
+    fitz = backends.module("fitz")
     doc = fitz.open(stream=file_bytes, filetype="pdf")
-    for page in doc:
+    for i, page in enumerate(doc):
+        if i == _page_limit(budget) or (budget is not None and budget.expired()):
+            break
         rect = page.rect
         region = fitz.Rect(rect.x0, rect.y0, rect.x1 / 2, rect.y1 / 2)
         words = page.get_text("words", clip=region)
@@ -80,6 +306,103 @@ def extract_words_in_copyB(file_bytes: bytes) -> List[str]:
     return tokens
 
 
+def extract_words_in_copyB_layout(file_bytes: bytes, budget: Optional[DocumentBudget] = None) -> List[str]:
+    """Copy B words via pdfplumber's layout analysis (slower, handles odd text layers)."""
+    (pdfplumber,) = backends.require("pdfplumber")
+    tokens: List[str] = []
+    with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
+        for page in pdf.pages[:_page_limit(budget)]:
+            if budget is not None and budget.expired():
+                break
+            quadrant = page.crop((0, 0, page.width / 2, page.height / 2))
+            words = quadrant.extract_words()
+            words.sort(key=lambda w: (round(w["top"], 1), round(w["x0"], 1)))
+            tokens.extend(w["text"].strip() for w in words if w["text"].strip())
+    return tokens
+
+
+def extract_words_in_copyB_ocr(file_bytes: bytes, dpi: int, budget: Optional[DocumentBudget] = None) -> List[str]:
+    """Copy B words via Tesseract on a render of the top-left quadrant, in reading order."""
+    fitz, Image, pytesseract = backends.require("ocr")
+    tokens: List[str] = []
+    with fitz.open(stream=file_bytes, filetype="pdf") as doc:
+        for i, page in enumerate(doc):
+            if i == _page_limit(budget):
+                break
+            rect = page.rect
+            region = fitz.Rect(rect.x0, rect.y0, rect.x1 / 2, rect.y1 / 2)
+            if not _render_allowed(budget, region, dpi):
+                raise TimeoutError("render budget exhausted")
+            pix = page.get_pixmap(dpi=dpi, clip=region)
+            img = Image.open(io.BytesIO(pix.tobytes("png")))
+            data = _tesseract(
+                budget, pytesseract.image_to_data, img,
+                lang="eng", config="--oem 1 --psm 4", output_type=pytesseract.Output.DICT,
+            )
+            words = [
+                (data["block_num"][j], data["par_num"][j], data["line_num"][j], data["word_num"][j], t.strip())
+                for j, t in enumerate(data["text"]) if t.strip()
+            ]
+            words.sort()
+            tokens.extend(w[4] for w in words)
+    return tokens
+
+
+# W-2 escalation ladder, cheapest first: (method, backend it needs, token extractor)
+W2_EXTRACTION_LADDER = (
+    ("copyb_words", "pymupdf", extract_words_in_copyB),
+    ("layout", "pdfplumber", extract_words_in_copyB_layout),
+    ("ocr_300dpi", "ocr", lambda data, budget=None: extract_words_in_copyB_ocr(data, 300, budget)),
+    ("ocr_450dpi", "ocr", lambda data, budget=None: extract_words_in_copyB_ocr(data, 450, budget)),
+)
+
+
+def extract_w2_boxes(
+    file_bytes: bytes,
+    budget: Optional[DocumentBudget] = None,
+    ocr_tokens: Optional[Dict[int, List[str]]] = None,
+) -> Tuple[List[str], List[str], List[Dict[str, Any]]]:
+    """
+    Read W-2 boxes 1–6, escalating to costlier extractors only while the
+    cross-field consistency score (logic.w2_checks) is below ACCEPT_SCORE.
+    `ocr_tokens` are the Copy B words from the page-level OCR pass (see
+    extract_text_with_stats); they are tried first, so a scanned W-2 is only
+    rendered and OCR'd again when that pass fails the checks.
+    With a `budget`, escalation stops once the document's time runs out.
+    Returns (best first-6 values, their tokens, every attempt made in order).
+    """
+    best_first6: List[str] = []
+    best_tokens: List[str] = []
+    best_score = -1.0
+    attempts: List[Dict[str, Any]] = []
+
+    ladder = W2_EXTRACTION_LADDER
+    if ocr_tokens:
+        reused = [t for _, page_tokens in sorted(ocr_tokens.items()) for t in page_tokens]
+        ladder = (("page_ocr", "ocr", lambda data, budget=None: reused),) + ladder
+
+    for method, backend, extractor in ladder:
+        if not backends.is_enabled(backend):
+            continue
+        if budget is not None and budget.expired():
+            attempts.append({"method": method, "error": "skipped: wall_seconds budget exhausted"})
+            break
+        try:
+            tokens = extractor(file_bytes, budget=budget)
+        except Exception as e:
+            attempts.append({"method": method, "error": f"{type(e).__name__}: {e}"})
+            continue
+        first6 = first_n_currency_in_order(tokens, 6)
+        attempt = summarize_attempt(method, first6)
+        attempts.append(attempt)
+        if attempt["score"] > best_score:
+            best_first6, best_tokens, best_score = first6, tokens, attempt["score"]
+        if attempt["score"] >= ACCEPT_SCORE:
+            break
+
+    return best_first6, best_tokens, attempts
+
+
 def first_n_currency_in_order(tokens: List[str], n: int) -> List[str]:
     vals = []
     for t in tokens:
@@ -107,170 +430,374 @@ def find_ca_state_line_amount(text: str) -> str:
     return best
 
 
-# ---------------------------
-# Main unified parser
-# ---------------------------
-def parse_documents(files: List[Any]) -> Dict[str, Any]:
+def attach_amounts_cents(doc: Dict[str, Any], amount_fields) -> Dict[str, Cents]:
     """
-    Identify each uploaded file (W-2, 1099-INT, 1099-NEC),
-    extract parsed fields and also compute summary totals for quick tax calculations.
+    Parse a document's amount fields to integer cents once, at extraction, and
+    store them on the document as "amounts_cents" so downstream code never
+    re-scrubs the display strings.
     """
-
-    parsed_docs = {}
-    summary = {
+    pf = doc.get("parsed_fields", {})
+    amounts = {}
+    for k, v in pf.items():
+        if k in amount_fields:
+            c = parse_cents(v)
+            if c is not None:
+                amounts[k] = c
+    doc["amounts_cents"] = amounts
+    return amounts
+
+
+def empty_summary_cents() -> Dict[str, Dict[str, Cents]]:
+    return {
         "income": {
-            "w2_wages": 0.0,
-            "int_interest": 0.0,
-            "nec_nonemployee_comp": 0.0,
+            "w2_wages": 0,
+            "int_interest": 0,
+            "nec_nonemployee_comp": 0,
         },
-        "withholding": {"federal": 0.0},
+        "withholding": {"federal": 0},
     }
 
-    for f in files:
-        data = f.read()
-        f.seek(0)
 
-        full_text = extract_text_from_pdf(data)
-        norm_full = normalize_spaces(full_text)
-        lower = norm_full.lower()
-
-        # --------------------------
-        # 1099-NEC
-        # --------------------------
-        if "1099-nec" in lower or "nonemployee compensation" in lower:
-            parsed_nec = parse_1099nec(data, f.name)
-            parsed_docs["1099-NEC"] = parsed_nec
-            try:
-                v = parsed_nec["parsed_fields"].get("box_1_nonemployee_compensation", "missing")
-                if v != "missing":
-                    summary["income"]["nec_nonemployee_comp"] += float(v.replace(",", ""))
-                w = parsed_nec["parsed_fields"].get("box_4_federal_income_tax_withheld", "missing")
-                if w != "missing":
-                    summary["withholding"]["federal"] += float(w.replace(",", ""))
-            except Exception:
-                pass
-            continue
-
-        # --------------------------
-        # 1099-INT
-        # --------------------------
-        if "1099-int" in lower or "form 1099-int" in lower or "interest income" in lower:
-            try:
-                parsed_int = parse_1099int(data, f.name)
-            except Exception as e:
-                #st.warning(f"⚠️ Could not fully parse {f.name}: {e}")
-                continue
-
-            parsed_docs["1099-INT"] = parsed_int
-
-            try:
-                v = parsed_int["parsed_fields"].get("box_1_interest_income", "missing")
-                if v != "missing":
-                    summary["income"]["int_interest"] += float(v.replace(",", ""))
-                w = parsed_int["parsed_fields"].get("box_4_federal_income_tax_withheld", "missing")
-                if w != "missing":
-                    summary["withholding"]["federal"] += float(w.replace(",", ""))
-            except Exception:
-                pass
-
-            continue
+def summary_to_dollars(summary_cents: Dict[str, Dict[str, Cents]]) -> Dict[str, Dict[str, float]]:
+    return {
+        group: {k: cents_to_dollars(v) for k, v in values.items()}
+        for group, values in summary_cents.items()
+    }
 
 
-        # --------------------------
-        # Default: W-2
-        # --------------------------
-        tokens = extract_words_in_copyB(data)
-        first6 = first_n_currency_in_order(tokens, 6)
+# ---------------------------
+# Main unified parser
+# ---------------------------
+def _parse_one(
+    data: bytes,
+    filename: str,
+    skip_pages: Optional[Dict[int, int]] = None,
+    budget: Optional[DocumentBudget] = None,
+) -> Optional[Tuple[str, Dict[str, Any], Dict[str, Dict[str, Cents]], str]]:
+    """
+    Classify and parse a single document. Returns (document key, parsed
+    document, its summary contributions in cents, extracted text), or None if
+    unparseable.
+    The document's "budget" entry reports spending and whether any limit cut
+    extraction short ("partial").
+    """
+    if budget is None:
+        budget = DocumentBudget()
+    ocr_tokens: Dict[int, List[str]] = {}
+    full_text, extraction = extract_text_with_stats(data, skip_pages=skip_pages, budget=budget, ocr_tokens=ocr_tokens)
+    norm_full = normalize_spaces(full_text)
+    lower = norm_full.lower()
+    contrib = empty_summary_cents()
 
-        parsed = {
-            "a_employee_ssn": "missing",
-            "1_wages_tips_other_comp": "missing",
-            "2_federal_income_tax_withheld": "missing",
-            "b_employer_ein": "missing",
-            "3_social_security_wages": "missing",
-            "4_social_security_tax_withheld": "missing",
-            "5_medicare_wages_and_tips": "missing",
-            "6_medicare_tax_withheld": "missing",
-            "c_employer_name_address_zip": "missing",
-            "d_control_number": "missing",
-            "e_employee_name_address_zip": "missing",
-            "7_social_security_tips": "missing",
-            "8_allocated_tips": "missing",
-            "9_blank": "missing",
-            "10_dependent_care_benefits": "missing",
-            "11_nonqualified_plans": "missing",
-            "12a_d_codes": "missing",
-            "13_checkboxes": "missing",
-            "14_other": "missing",
-            "15_state_employer_id": "missing",
-            "16_state_wages_tips": "missing",
-            "17_state_income_tax": "missing",
-            "18_local_wages_tips": "missing",
-            "19_local_income_tax": "missing",
-            "20_locality_name": "missing",
-        }
-
-        if len(first6) >= 6:
-            parsed["1_wages_tips_other_comp"] = first6[0]
-            parsed["2_federal_income_tax_withheld"] = first6[1]
-            parsed["3_social_security_wages"] = first6[2]
-            parsed["4_social_security_tax_withheld"] = first6[3]
-            parsed["5_medicare_wages_and_tips"] = first6[4]
-            parsed["6_medicare_tax_withheld"] = first6[5]
+    # --------------------------
+    # 1099-NEC
+    # --------------------------
+    if "1099-nec" in lower or "nonemployee compensation" in lower:
+        parsed_nec = parse_1099nec(data, filename)
+        parsed_nec["extraction"] = extraction
+        parsed_nec["budget"] = budget.report()
+        amounts = attach_amounts_cents(parsed_nec, NEC_1099_AMOUNT_FIELDS)
+        contrib["income"]["nec_nonemployee_comp"] += amounts.get("box_1_nonemployee_compensation", 0)
+        contrib["withholding"]["federal"] += amounts.get("box_4_federal_income_tax_withheld", 0)
+        return "1099-NEC", parsed_nec, contrib, full_text
 
+    # --------------------------
+    # 1099-INT
+    # --------------------------
+    if "1099-int" in lower or "form 1099-int" in lower or "interest income" in lower:
         try:
-            if parsed["1_wages_tips_other_comp"] != "missing":
-                summary["income"]["w2_wages"] += float(parsed["1_wages_tips_other_comp"])
-            if parsed["2_federal_income_tax_withheld"] != "missing":
-                summary["withholding"]["federal"] += float(parsed["2_federal_income_tax_withheld"])
-        except Exception:
-            pass
-
-        # detect SSN and EIN
-        m_ssn = re.search(r"\b\d{3}-\d{2}-\d{4}\b", norm_full)
-        if m_ssn:
-            parsed["a_employee_ssn"] = m_ssn.group(0)
-        m_ein = re.search(r"\b\d{2}-\d{7}\b", norm_full)
-        if m_ein:
-            parsed["b_employer_ein"] = m_ein.group(0)
-
-        # detect employer and employee address
-        m_emp = re.search(r"cinemark\s+usa.*?plano,\s*tx\s*\d{5}", full_text, flags=re.IGNORECASE | re.DOTALL)
-        if m_emp:
-            parsed["c_employer_name_address_zip"] = normalize_spaces(m_emp.group(0))
-        m_person = re.search(r"krish\s+thakur.*?tracy,\s*ca\s*\d{5}", full_text, flags=re.IGNORECASE | re.DOTALL)
-        if m_person:
-            parsed["e_employee_name_address_zip"] = normalize_spaces(m_person.group(0))
-
-        casdi = find_after_keyword(full_text, r"CASDI")
-        if casdi:
-            parsed["14_other"] = casdi
-        st_tax = find_ca_state_line_amount(full_text)
-        if st_tax:
-            parsed["17_state_income_tax"] = st_tax
-
-        missing_fields = [k for k, v in parsed.items() if v == "missing"]
-
-        parsed_docs["w2"] = {
-            "filename": f.name,
-            "form_type": "W-2",
-            "parsed_fields": parsed,
-            "missing_fields": missing_fields,
-            "notes": [
-                f"Copy B top-left words extracted: {len(tokens)} tokens",
-                f"First 6 currency tokens (order-preserved): {first6}",
-            ],
-        }
+            parsed_int = parse_1099int(data, filename)
+        except Exception as e:
+            #st.warning(f"⚠️ Could not fully parse {filename}: {e}")
+            return None
+
+        parsed_int["extraction"] = extraction
+        parsed_int["budget"] = budget.report()
+        amounts = attach_amounts_cents(parsed_int, INT_1099_AMOUNT_FIELDS)
+        contrib["income"]["int_interest"] += amounts.get("box_1_interest_income", 0)
+        contrib["withholding"]["federal"] += amounts.get("box_4_federal_income_tax_withheld", 0)
+        return "1099-INT", parsed_int, contrib, full_text
 
     # --------------------------
-    # Final return payload
+    # Default: W-2
     # --------------------------
+    first6, tokens, w2_attempts = extract_w2_boxes(data, budget=budget, ocr_tokens=ocr_tokens)
+    w2_confidence = max((a.get("score", 0.0) for a in w2_attempts), default=0.0)
+    extraction["w2_path"] = w2_attempts
+
+    parsed = {k: "missing" for k in W2_FIELDS}
+
+    if len(first6) >= 6:
+        parsed["1_wages_tips_other_comp"] = first6[0]
+        parsed["2_federal_income_tax_withheld"] = first6[1]
+        parsed["3_social_security_wages"] = first6[2]
+        parsed["4_social_security_tax_withheld"] = first6[3]
+        parsed["5_medicare_wages_and_tips"] = first6[4]
+        parsed["6_medicare_tax_withheld"] = first6[5]
+
+    # detect SSN and EIN
+    m_ssn = re.search(r"\b\d{3}-\d{2}-\d{4}\b", norm_full)
+    if m_ssn:
+        parsed["a_employee_ssn"] = m_ssn.group(0)
+    m_ein = re.search(r"\b\d{2}-\d{7}\b", norm_full)
+    if m_ein:
+        parsed["b_employer_ein"] = m_ein.group(0)
+
+    # detect employer and employee address
+    m_emp = re.search(r"cinemark\s+usa.*?plano,\s*tx\s*\d{5}", full_text, flags=re.IGNORECASE | re.DOTALL)
+    if m_emp:
+        parsed["c_employer_name_address_zip"] = normalize_spaces(m_emp.group(0))
+    m_person = re.search(r"krish\s+thakur.*?tracy,\s*ca\s*\d{5}", full_text, flags=re.IGNORECASE | re.DOTALL)
+    if m_person:
+        parsed["e_employee_name_address_zip"] = normalize_spaces(m_person.group(0))
+
+    casdi = find_after_keyword(full_text, r"CASDI")
+    if casdi:
+        parsed["14_other"] = casdi
+    st_tax = find_ca_state_line_amount(full_text)
+    if st_tax:
+        parsed["17_state_income_tax"] = st_tax
+
+    missing_fields = [k for k, v in parsed.items() if v == "missing"]
+
+    doc = {
+        "filename": filename,
+        "form_type": "W-2",
+        "parsed_fields": parsed,
+        "missing_fields": missing_fields,
+        "notes": [
+            f"Copy B top-left words extracted: {len(tokens)} tokens",
+            f"First 6 currency tokens (order-preserved): {first6}",
+            "Extraction path: " + " → ".join(
+                f"{a['method']} ({a['score']:.2f})" if "score" in a else f"{a['method']} (failed)"
+                for a in w2_attempts
+            ),
+        ],
+        "extraction": extraction,
+        "confidence": w2_confidence,
+        "needs_review": w2_confidence < ACCEPT_SCORE or bool(budget.exceeded),
+        "budget": budget.report(),
+    }
+    amounts = attach_amounts_cents(doc, W2_AMOUNT_FIELDS)
+    contrib["income"]["w2_wages"] += amounts.get("1_wages_tips_other_comp", 0)
+    contrib["withholding"]["federal"] += amounts.get("2_federal_income_tax_withheld", 0)
+    return "w2", doc, contrib, full_text
+
+
+def _payload(
+    parsed_docs: Dict[str, Any],
+    summary,
+    duplicates: List[Dict[str, Any]],
+    doc_list: List[Dict[str, Any]],
+    failed: List[Dict[str, Any]],
+    possible_duplicates: Optional[List[Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    summary = {group: dict(values) for group, values in summary.items()}
     return {
-        "summary": summary,           # quick totals for tax logic
-        "documents": parsed_docs,     # all individual forms with full parsed_fields
+        "summary": summary_to_dollars(summary),   # quick totals for tax logic (dollars)
+        "summary_cents": summary,                 # same totals in integer cents
+        "documents": dict(parsed_docs),           # latest form of each type with full parsed_fields
+        "document_list": list(doc_list),          # every parsed form in upload order
+        "duplicates": list(duplicates),           # uploads skipped as exact / near duplicates
+        "possible_duplicates": list(possible_duplicates or ()),  # look-alike scans: parsed, flagged for review
+        "failed": list(failed),                   # uploads cancelled by their budget or crashed
         "raw_fields": {
             "w2": parsed_docs.get("w2", {}),
             "1099-INT": parsed_docs.get("1099-INT", {}),
             "1099-NEC": parsed_docs.get("1099-NEC", {}),
         },
     }
+
+
+def iter_parse_documents(
+    files: Iterable[Any],
+    cancel=None,
+    limits: Optional[Dict[str, float]] = None,
+    isolate: Union[bool, IsolatedParser] = False,
+    index=None,
+    client_id: Optional[str] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Streaming form of parse_documents(): yields one event per file as soon as
+    it is done, so callers can show results before the whole batch finishes.
+
+    Each event has "index", "total" (None if unknown), "filename", "status"
+    ("parsed" | "partial" | "failed" | "duplicate" | "unparsed"), "form_type"
+    and "document" (or "duplicate" / "error"), "possible_duplicate" when a
+    parsed scan looks like an earlier upload, and "result": the
+    parse_documents() payload *so far*, with the summary updated incrementally.
+
+    `cancel` is any object with is_set() (e.g. threading.Event); it is checked
+    before each file and stops the stream early when set.
+
+    `limits` overrides the per-document budget (see logic.budgets). With
+    `isolate`, each document is parsed in a worker subprocess that is killed
+    when the document overruns its wall time; that document is reported as
+    "failed" and the rest of the batch continues. Pass an IsolatedParser
+    instead of True to reuse one worker across calls.
+
+    Parsed documents are written to the full-text index (logic.text_index)
+    given as `index` (a connection), or named by TAXRETURN_TEXT_INDEX, keyed
+    by content hash and tagged with `client_id`.
+    """
+    if not hasattr(files, "__len__"):
+        files = list(files)
+    total = len(files)
+    parsed_docs: Dict[str, Any] = {}
+    doc_list: List[Dict[str, Any]] = []
+    summary = empty_summary_cents()
+    duplicates: List[Dict[str, Any]] = []
+    possible: List[Dict[str, Any]] = []
+    failed: List[Dict[str, Any]] = []
+    owns_worker = isolate is True
+    worker = IsolatedParser() if owns_worker else (isolate or None)
+    owns_index = index is None
+    text_index = open_text_index_from_env() if owns_index else index
+    # fingerprinting opens and renders the PDF too, so it gets the same budget
+    # (and the same worker, when isolated) as parsing
+    if worker is not None:
+        dedup = DuplicateIndex(lambda data: worker.fingerprints(data, limits))
+    else:
+        dedup = DuplicateIndex(lambda data: page_fingerprints(data, DocumentBudget(limits)))
+
+    try:
+        for i, f in enumerate(files):
+            if cancel is not None and cancel.is_set():
+                return
+            data = f.read()
+            f.seek(0)
+            event: Dict[str, Any] = {"index": i, "total": total, "filename": f.name}
+
+            try:
+                dup = dedup.check(data, f.name)
+            except DocumentFailed as e:
+                failed.append({"filename": f.name, "error": str(e)})
+                event.update(status="failed", form_type=None, document=None, error=str(e))
+                event["result"] = _payload(parsed_docs, summary, duplicates, doc_list, failed, possible)
+                yield event
+                continue
+            if dup is not None and dup["kind"] != "possible":
+                duplicates.append(dup)
+                event.update(status="duplicate", form_type=None, duplicate=dup)
+            else:
+                if dup is not None:
+                    possible.append(dup)
+                    event["possible_duplicate"] = dup
+                skip = duplicate_pages(dedup.fingerprints(data))
+                try:
+                    if worker is not None:
+                        parsed = worker.parse(data, f.name, skip, limits)
+                    else:
+                        parsed = _parse_one(data, f.name, skip, DocumentBudget(limits))
+                except DocumentFailed as e:
+                    failed.append({"filename": f.name, "error": str(e)})
+                    parsed = None
+                    event.update(status="failed", form_type=None, error=str(e))
+                if parsed is None:
+                    event.setdefault("status", "unparsed")
+                    event.setdefault("form_type", None)
+                    event.setdefault("document", None)
+                else:
+                    key, doc, contrib, full_text = parsed
+                    # only a parsed upload can stand in for later copies of itself
+                    dedup.add(data, f.name)
+                    if text_index is not None:
+                        try:
+                            index_document(text_index, dedup.digest(data), doc, full_text, client_id)
+                        except sqlite3.Error as e:
+                            event["index_error"] = f"{type(e).__name__}: {e}"
+                    parsed_docs[key] = doc
+                    doc_list.append(doc)
+                    for group, values in contrib.items():
+                        for k, v in values.items():
+                            summary[group][k] += v
+                    status = "partial" if doc.get("budget", {}).get("status") == "partial" else "parsed"
+                    event.update(status=status, form_type=doc.get("form_type"), document=doc)
+
+            event["result"] = _payload(parsed_docs, summary, duplicates, doc_list, failed, possible)
+            yield event
+    finally:
+        if owns_worker:
+            worker.close()
+        if owns_index and text_index is not None:
+            text_index.close()
+
+
+async def aiter_parse_documents(
+    files: Iterable[Any],
+    cancel=None,
+    limits: Optional[Dict[str, float]] = None,
+    isolate: Union[bool, IsolatedParser] = False,
+    index=None,
+    client_id: Optional[str] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Async variant of iter_parse_documents(); each document is parsed in a worker thread."""
+    gen = iter_parse_documents(
+        files, cancel=cancel, limits=limits, isolate=isolate, index=index, client_id=client_id
+    )
+    done = object()
+    while True:
+        event = await asyncio.to_thread(next, gen, done)
+        if event is done:
+            return
+        yield event
+
+
+def parse_documents(
+    files: List[Any],
+    limits: Optional[Dict[str, float]] = None,
+    isolate: Union[bool, IsolatedParser] = False,
+    index=None,
+    client_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Identify each uploaded file (W-2, 1099-INT, 1099-NEC),
+    extract parsed fields and also compute summary totals for quick tax calculations.
+
+    Exact and near-duplicate uploads are detected before extraction; they are
+    reported under "duplicates" and never parsed or counted in the summary.
+    Scans that only look alike are parsed as usual and also listed under
+    "possible_duplicates" for review.
+    Each document runs under a resource budget (`limits`, see logic.budgets);
+    documents cancelled for overrunning it are listed under "failed".
+    Parsed documents are also written to the full-text index when one is
+    given or configured (see iter_parse_documents).
+    """
+    result = _payload({}, empty_summary_cents(), [], [], [])
+    for event in iter_parse_documents(files, limits=limits, isolate=isolate, index=index, client_id=client_id):
+        result = event["result"]
+    return result
+
+
+def merge_parsed_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Combine several parse_documents() payloads (e.g. one per uploaded file)
+    into a single payload of the same shape. Later documents of the same form
+    type replace earlier ones in "documents", exactly as in a single
+    parse_documents() call; "document_list" keeps all of them.
+    """
+    summary = empty_summary_cents()
+    parsed_docs: Dict[str, Any] = {}
+    doc_list: List[Dict[str, Any]] = []
+    duplicates: List[Dict[str, Any]] = []
+    possible: List[Dict[str, Any]] = []
+    failed: List[Dict[str, Any]] = []
+
+    for r in results:
+        s = r.get("summary_cents")
+        if s is None:   # payload from before integer-cents totals
+            s = {
+                group: {k: parse_cents(v, 0) for k, v in values.items()}
+                for group, values in r.get("summary", {}).items()
+            }
+        for group, values in s.items():
+            for k, v in values.items():
+                summary.setdefault(group, {})
+                summary[group][k] = summary[group].get(k, 0) + v
+        parsed_docs.update(r.get("documents", {}))
+        doc_list.extend(r.get("document_list", list(r.get("documents", {}).values())))
+        duplicates.extend(r.get("duplicates", []))
+        possible.extend(r.get("possible_duplicates", []))
+        failed.extend(r.get("failed", []))
+
+    return _payload(parsed_docs, summary, duplicates, doc_list, failed, possible)
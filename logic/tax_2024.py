@@ -1,6 +1,14 @@
 # logic/tax_2024.py
 from typing import Dict, Tuple
 
+from logic.money import (
+    Cents,
+    cents_dict_to_dollars,
+    cents_to_dollars,
+    dollars_to_cents,
+    parse_cents,
+)
+
 # 2024 STANDARD DEDUCTION (IRS)
 STANDARD_DEDUCTION = {
     "single": 14600.0,
@@ -51,39 +59,105 @@ BRACKETS_2024 = {
     ],
 }
 
-def standard_deduction(filing_status: str) -> float:
+# Integer-cents views of the tables above (rates in basis points), used by the
+# fixed-point engine so no float arithmetic happens inside the tax computation.
+STANDARD_DEDUCTION_CENTS = {k: dollars_to_cents(v) for k, v in STANDARD_DEDUCTION.items()}
+BRACKETS_2024_CENTS = {
+    status: [
+        (None if top is None else top * 100, int(round(rate * 10000)))
+        for top, rate in brackets
+    ]
+    for status, brackets in BRACKETS_2024.items()
+}
+
+
+def _status_key(filing_status: str) -> str:
     key = filing_status.strip().lower()
-    return float(STANDARD_DEDUCTION.get(key, STANDARD_DEDUCTION["single"]))
+    return key if key in BRACKETS_2024 else "single"
+
+
+def standard_deduction_cents(filing_status: str) -> Cents:
+    return STANDARD_DEDUCTION_CENTS[_status_key(filing_status)]
+
+
+def standard_deduction(filing_status: str) -> float:
+    return cents_to_dollars(standard_deduction_cents(filing_status))
+
+
+def tax_from_brackets_cents(taxable_cents: Cents, filing_status: str) -> Cents:
+    """
+    Piecewise apply 2024 marginal rates to taxable income in cents.
+    Accumulates in cent·basis-point units and rounds half-up once at the end.
+    """
+    if taxable_cents <= 0:
+        return 0
+
+    tax_units = 0
+    prev_top = 0
+    for top, rate_bp in BRACKETS_2024_CENTS[_status_key(filing_status)]:
+        if top is None or taxable_cents <= top:
+            tax_units += (taxable_cents - prev_top) * rate_bp
+            break
+        tax_units += (top - prev_top) * rate_bp
+        prev_top = top
+
+    return (tax_units + 5000) // 10000
+
 
 def tax_from_brackets(taxable_income: float, filing_status: str) -> float:
     """
     Piecewise apply 2024 marginal rates to 'taxable_income'.
     """
-    if taxable_income <= 0:
-        return 0.0
+    return cents_to_dollars(tax_from_brackets_cents(parse_cents(taxable_income, 0), filing_status))
 
-    key = filing_status.strip().lower()
-    brackets = BRACKETS_2024.get(key, BRACKETS_2024["single"])
 
-    tax = 0.0
-    prev_top = 0.0
-    remaining = taxable_income
+# parse_documents() "summary_cents" income key → compute_tax_summary_cents() income key
+SUMMARY_INCOME_KEYS = (
+    ("w2_wages", "w2_wages"),
+    ("int_interest", "interest"),
+    ("nec_nonemployee_comp", "nec"),
+)
 
-    for top, rate in brackets:
-        if top is None:
-            # last bracket
-            span = max(0.0, remaining)
-            tax += span * rate
-            break
-        span = min(remaining, top - prev_top)
-        if span > 0:
-            tax += span * rate
-            remaining -= span
-            prev_top = top
-        if remaining <= 0:
-            break
 
-    return round(tax, 2)
+def income_cents_from_summary(summary_cents: Dict[str, Dict[str, Cents]]) -> Dict[str, Cents]:
+    """The engine's income_cents from a parse_documents() "summary_cents" dict."""
+    income = summary_cents.get("income", {})
+    return {dst: int(income.get(src, 0)) for src, dst in SUMMARY_INCOME_KEYS}
+
+
+def compute_tax_summary_cents(
+    income_cents: Dict[str, Cents],
+    withholding_cents: Cents,
+    filing_status: str
+) -> Dict[str, Cents]:
+    """
+    Integer-cents tax engine. income_cents example:
+      {"w2_wages": 501597, "interest": 120000, "nec": 1234500}
+    Every returned value is in cents.
+    """
+    wages = int(income_cents.get("w2_wages", 0))
+    interest = int(income_cents.get("interest", 0))
+    nec = int(income_cents.get("nec", 0))
+
+    agi = wages + interest + nec  # prototype: no adjustments
+    std_ded = standard_deduction_cents(filing_status)
+    taxable_income = max(0, agi - std_ded)
+    estimated_tax = tax_from_brackets_cents(taxable_income, filing_status)
+    withholding = int(withholding_cents)
+
+    return {
+        "wages": wages,
+        "interest": interest,
+        "nec": nec,
+        "agi": agi,
+        "standard_deduction": std_ded,
+        "taxable_income": taxable_income,
+        "estimated_tax": estimated_tax,
+        "withholding": withholding,
+        "balance_due": max(0, estimated_tax - withholding),
+        "refund": max(0, withholding - estimated_tax),
+    }
+
 
 def compute_tax_summary(
     income_components: Dict[str, float],
@@ -97,29 +171,10 @@ def compute_tax_summary(
         "interest": 1200.00,
         "nec": 12345.00
       }
+    Dollar-denominated wrapper around compute_tax_summary_cents().
     """
-    wages = float(income_components.get("w2_wages", 0.0))
-    interest = float(income_components.get("interest", 0.0))
-    nec = float(income_components.get("nec", 0.0))
-
-    agi = wages + interest + nec  # prototype: no adjustments
-    std_ded = standard_deduction(filing_status)
-    taxable_income = max(0.0, agi - std_ded)
-    estimated_tax = tax_from_brackets(taxable_income, filing_status)
-    withholding = float(total_withholding)
-
-    balance_due = max(0.0, estimated_tax - withholding)
-    refund = max(0.0, withholding - estimated_tax)
-
-    return {
-        "wages": round(wages, 2),
-        "interest": round(interest, 2),
-        "nec": round(nec, 2),
-        "agi": round(agi, 2),
-        "standard_deduction": round(std_ded, 2),
-        "taxable_income": round(taxable_income, 2),
-        "estimated_tax": round(estimated_tax, 2),
-        "withholding": round(withholding, 2),
-        "balance_due": round(balance_due, 2),
-        "refund": round(refund, 2),
-    }
+    income_cents = {k: parse_cents(v, 0) for k, v in income_components.items()}
+    summary = compute_tax_summary_cents(
+        income_cents, parse_cents(total_withholding, 0), filing_status
+    )
+    return cents_dict_to_dollars(summary)
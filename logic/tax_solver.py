@@ -0,0 +1,200 @@
+# logic/tax_solver.py
+#
+# Closed-form inverses of the 2024 tax computation in logic/tax_2024.py.
+#
+# Tax on taxable income t is piecewise linear: within a bracket starting at
+# `lo` with rate r, tax_units(t) = units(lo) + (t - lo) · r, in cent·basis-point
+# units, and the tax in cents is floor((tax_units + 5000) / 10000). Both are
+# non-decreasing, so "smallest income with tax ≥ T" has an exact answer from
+# the bracket's cumulative units — no iteration over compute_tax_summary().
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from logic.money import Cents, cents_to_dollars, parse_cents
+from logic.tax_2024 import (
+    BRACKETS_2024_CENTS,
+    _status_key,
+    compute_tax_summary_cents,
+    standard_deduction_cents,
+)
+
+# status → ((bracket start, bracket top or None, rate_bp, tax units at start), ...)
+Segment = Tuple[Cents, Optional[Cents], int, int]
+
+
+def _segments(brackets) -> Tuple[Segment, ...]:
+    out = []
+    lo, units = 0, 0
+    for top, rate_bp in brackets:
+        out.append((lo, top, rate_bp, units))
+        if top is not None:
+            units += (top - lo) * rate_bp
+            lo = top
+    return tuple(out)
+
+
+SEGMENTS = {status: _segments(b) for status, b in BRACKETS_2024_CENTS.items()}
+_TOPS = {status: [s[1] for s in segs if s[1] is not None] for status, segs in SEGMENTS.items()}
+
+
+def _segment_for(taxable_cents: Cents, status: str) -> Segment:
+    # Bracket tops are inclusive, matching tax_from_brackets_cents().
+    return SEGMENTS[status][bisect_left(_TOPS[status], taxable_cents)]
+
+
+def tax_cents(taxable_cents: Cents, filing_status: str) -> Cents:
+    """Same result as tax_from_brackets_cents(), via one bracket lookup."""
+    if taxable_cents <= 0:
+        return 0
+    lo, _, rate_bp, units = _segment_for(taxable_cents, _status_key(filing_status))
+    return (units + (taxable_cents - lo) * rate_bp + 5000) // 10000
+
+
+def taxable_income_for_tax_cents(target_tax: Cents, filing_status: str) -> Cents:
+    """Smallest taxable income (cents) whose tax is at least `target_tax` cents."""
+    if target_tax <= 0:
+        return 0
+    needed = target_tax * 10000 - 5000   # rounded tax ≥ T  ⇔  units ≥ 10000·T − 5000
+    for lo, top, rate_bp, units in SEGMENTS[_status_key(filing_status)]:
+        if top is None or units + (top - lo) * rate_bp >= needed:
+            return lo + -(-(needed - units) // rate_bp)
+    raise AssertionError("bracket table has no open-ended top bracket")
+
+
+def max_taxable_income_for_tax_cents(max_tax: Cents, filing_status: str) -> Optional[Cents]:
+    """Largest taxable income (cents) whose tax is at most `max_tax`; None if max_tax < 0."""
+    if max_tax < 0:
+        return None
+    return taxable_income_for_tax_cents(max_tax + 1, filing_status) - 1
+
+
+# ---------------------------
+# Preparer questions
+# ---------------------------
+def _income_total(income_cents: Dict[str, Cents]) -> Cents:
+    return sum(int(income_cents.get(k, 0)) for k in ("w2_wages", "interest", "nec"))
+
+
+def withholding_for_target_cents(
+    income_cents: Dict[str, Cents],
+    withholding_cents: Cents,
+    filing_status: str,
+    target_refund: Cents = 0,
+    target_balance_due: Cents = 0,
+) -> Dict[str, Cents]:
+    """
+    Total withholding / estimated payments that land the return on the target
+    (default: zero balance due). "additional_withholding" is relative to the
+    current withholding and is negative when the client is already over it.
+    """
+    if target_refund and target_balance_due:
+        raise ValueError("Pass target_refund or target_balance_due, not both")
+    summary = compute_tax_summary_cents(income_cents, withholding_cents, filing_status)
+    required = max(0, summary["estimated_tax"] + target_refund - target_balance_due)
+    return {
+        "estimated_tax": summary["estimated_tax"],
+        "withholding": summary["withholding"],
+        "required_withholding": required,
+        "additional_withholding": required - summary["withholding"],
+    }
+
+
+def income_for_target_cents(
+    income_cents: Dict[str, Cents],
+    withholding_cents: Cents,
+    filing_status: str,
+    target_refund: Cents = 0,
+    target_balance_due: Cents = 0,
+) -> Dict[str, Optional[Cents]]:
+    """
+    Largest AGI at which the current withholding still yields at least
+    `target_refund` (or owes at most `target_balance_due`); default: the most
+    income the client can have before owing anything. "additional_income" is
+    relative to the current AGI (negative when already past the target);
+    both are None when even zero income cannot reach the target.
+    """
+    if target_refund and target_balance_due:
+        raise ValueError("Pass target_refund or target_balance_due, not both")
+    max_tax = int(withholding_cents) - target_refund + target_balance_due
+    taxable = max_taxable_income_for_tax_cents(max_tax, filing_status)
+    if taxable is None:
+        return {"max_agi": None, "additional_income": None}
+    max_agi = taxable + standard_deduction_cents(filing_status)
+    return {"max_agi": max_agi, "additional_income": max_agi - _income_total(income_cents)}
+
+
+def bracket_headroom_cents(income_cents: Dict[str, Cents], filing_status: str) -> Dict[str, Optional[Cents]]:
+    """
+    The client's marginal bracket and how much more income stays inside it
+    (None in the top bracket). At an exact bracket top the next cent is taxed
+    at the next rate, so headroom there is 0.
+    """
+    status = _status_key(filing_status)
+    taxable = max(0, _income_total(income_cents) - standard_deduction_cents(status))
+    lo, top, rate_bp, _ = _segment_for(max(1, taxable), status)
+    return {
+        "taxable_income": taxable,
+        "marginal_rate_bp": rate_bp,
+        "bracket_top": top,
+        "headroom": None if top is None else top - taxable,
+    }
+
+
+def solve_cents(
+    income_cents: Dict[str, Cents],
+    withholding_cents: Cents,
+    filing_status: str,
+    target_refund: Cents = 0,
+    target_balance_due: Cents = 0,
+) -> Dict[str, Optional[Cents]]:
+    """All three answers for one client, in cents."""
+    out: Dict[str, Optional[Cents]] = {}
+    out.update(withholding_for_target_cents(
+        income_cents, withholding_cents, filing_status, target_refund, target_balance_due
+    ))
+    out.update(income_for_target_cents(
+        income_cents, withholding_cents, filing_status, target_refund, target_balance_due
+    ))
+    out.update(bracket_headroom_cents(income_cents, filing_status))
+    return out
+
+
+def solve_batch_cents(clients: Iterable[Dict[str, Any]]) -> List[Dict[str, Optional[Cents]]]:
+    """
+    solve_cents() for many clients. Each client dict has "income_cents",
+    "withholding_cents", "filing_status" and optionally "target_refund" /
+    "target_balance_due" (cents).
+    """
+    return [
+        solve_cents(
+            c.get("income_cents", {}),
+            c.get("withholding_cents", 0),
+            c.get("filing_status", "single"),
+            c.get("target_refund", 0),
+            c.get("target_balance_due", 0),
+        )
+        for c in clients
+    ]
+
+
+def solve(
+    income_components: Dict[str, float],
+    total_withholding: float,
+    filing_status: str,
+    target_refund: float = 0.0,
+    target_balance_due: float = 0.0,
+) -> Dict[str, Optional[float]]:
+    """Dollar-denominated wrapper around solve_cents() (rates stay in basis points)."""
+    result = solve_cents(
+        {k: parse_cents(v, 0) for k, v in income_components.items()},
+        parse_cents(total_withholding, 0),
+        filing_status,
+        parse_cents(target_refund, 0),
+        parse_cents(target_balance_due, 0),
+    )
+    rate_bp = result.pop("marginal_rate_bp")
+    dollars: Dict[str, Optional[float]] = {
+        k: None if v is None else cents_to_dollars(v) for k, v in result.items()
+    }
+    dollars["marginal_rate_bp"] = rate_bp
+    return dollars
@@ -0,0 +1,346 @@
+# logic/text_index.py
+#
+# Local full-text index over extracted document text, across clients.
+#
+# parse_documents() writes every parsed document here (when given an index
+# connection, or when TAXRETURN_TEXT_INDEX names a database file), keyed by
+# the SHA-256 of the uploaded bytes:
+#     documents  one row per document: form type, filename, client, employer /
+#                payer identifier (EIN or payer TIN), last 4 of the recipient's
+#                SSN / TIN
+#     amounts    every parsed amount in integer cents, for exact lookups
+#     doc_text   FTS5 table over the extracted text and payer name
+# so "every W-2 from EIN 12-3456789" or "every 1099-INT from this payer" is
+# an indexed query instead of a re-extraction pass.
+#
+# Full recipient SSNs are never stored: they are masked in the indexed text.
+import argparse
+import json
+import os
+import re
+import sqlite3
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from logic.money import Cents, cents_to_dollars, parse_cents
+
+ENV_VAR = "TAXRETURN_TEXT_INDEX"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    sha256          TEXT PRIMARY KEY,
+    client_id       TEXT,
+    filename        TEXT NOT NULL,
+    form_type       TEXT NOT NULL,
+    ein             TEXT,            -- W-2 box b / 1099 payer TIN, as printed
+    ein_key         TEXT,            -- the same, digits only (lookup key)
+    payer           TEXT,            -- employer / payer name and address
+    recipient_last4 TEXT,
+    indexed_at      REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_by_client ON documents (client_id);
+CREATE TABLE IF NOT EXISTS amounts (
+    sha256 TEXT NOT NULL,
+    field  TEXT NOT NULL,
+    cents  INTEGER NOT NULL,
+    PRIMARY KEY (sha256, field)
+);
+CREATE INDEX IF NOT EXISTS amounts_by_value ON amounts (cents, field);
+CREATE VIRTUAL TABLE IF NOT EXISTS doc_text USING fts5(
+    sha256 UNINDEXED,
+    payer,
+    body,
+    tokenize = 'unicode61'
+);
+"""
+
+# (identifier field, payer field, recipient field) per form type
+IDENTITY_FIELDS = {
+    "W-2": ("b_employer_ein", "c_employer_name_address_zip", "a_employee_ssn"),
+    "1099-INT": ("payer_tin", "payer_name_address", "recipient_tin"),
+    "1099-NEC": ("payer_tin", "payer_name_address", "recipient_tin"),
+}
+
+# 123-45-6789 or 123 45 6789 (both separators, the same one twice). Bare
+# nine-digit runs are too easily ZIP+4 codes or account numbers to mask
+# blindly; the parsed recipient SSN / TIN is masked in any format instead.
+SSN_RE = re.compile(r"(?<![\w.,$-])(\d{3})([- ])(\d{2})\2(\d{4})(?![\w-]|[.,]\d)")
+_MISSING = (None, "", "missing")
+
+
+# ---------------------------
+# Connection
+# ---------------------------
+def open_text_index(path: str) -> sqlite3.Connection:
+    """Open (and create if needed) a text index. Safe to share across processes."""
+    conn = sqlite3.connect(path, timeout=30.0, isolation_level=None, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    conn.executescript(SCHEMA)
+    _migrate(conn)
+    return conn
+
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    """Bring an index created by an older version up to SCHEMA (adds documents.ein_key)."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        columns = {r["name"] for r in conn.execute("PRAGMA table_info(documents)")}
+        if "ein_key" not in columns:
+            conn.execute("ALTER TABLE documents ADD COLUMN ein_key TEXT")
+            for r in conn.execute("SELECT sha256, ein FROM documents WHERE ein IS NOT NULL").fetchall():
+                conn.execute("UPDATE documents SET ein_key=? WHERE sha256=?", (ein_key(r["ein"]), r["sha256"]))
+            conn.execute("DROP INDEX IF EXISTS documents_by_ein")
+        conn.execute("CREATE INDEX IF NOT EXISTS documents_by_ein_key ON documents (ein_key, form_type)")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def open_text_index_from_env() -> Optional[sqlite3.Connection]:
+    path = os.environ.get(ENV_VAR, "").strip()
+    return open_text_index(path) if path else None
+
+
+# ---------------------------
+# Writing
+# ---------------------------
+def mask_ssns(text: str, known: Iterable[Optional[str]] = ()) -> str:
+    """
+    Mask SSN-shaped numbers to XXX-XX-last4. `known` are the recipient
+    SSN / TIN values parsed from the document; they are masked wherever they
+    appear verbatim, whatever their format.
+    """
+    for value in known:
+        digits = re.sub(r"\D", "", value or "")
+        if len(digits) >= 4:
+            text = text.replace(value, f"XXX-XX-{digits[-4:]}")
+    return SSN_RE.sub(lambda m: f"XXX-XX-{m.group(4)}", text)
+
+
+def ein_key(identifier: Optional[str]) -> Optional[str]:
+    """Digits-only form of an EIN / TIN, so 12-3456789 and 123456789 match."""
+    digits = re.sub(r"\D", "", identifier or "")
+    return digits or None
+
+
+def _field(doc: Dict[str, Any], key: Optional[str]) -> Optional[str]:
+    v = (doc.get("parsed_fields") or {}).get(key) if key else None
+    return None if v in _MISSING else str(v).strip()
+
+
+def index_document(
+    conn: sqlite3.Connection,
+    sha256: str,
+    doc: Dict[str, Any],
+    text: str,
+    client_id: Optional[str] = None,
+) -> None:
+    """Insert or replace one parsed document (as produced by parse_documents)."""
+    form_type = doc.get("form_type") or "unknown"
+    ein_field, payer_field, recipient_field = IDENTITY_FIELDS.get(form_type, (None, None, None))
+    ein, payer, recipient = _field(doc, ein_field), _field(doc, payer_field), _field(doc, recipient_field)
+    recipient_last4 = re.sub(r"\D", "", recipient)[-4:] if recipient else None
+
+    amounts = dict(doc.get("amounts_cents") or {})
+    if not amounts:   # documents parsed before amounts_cents existed
+        for k, v in (doc.get("parsed_fields") or {}).items():
+            c = parse_cents(v)
+            if c is not None:
+                amounts[k] = c
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            "INSERT OR REPLACE INTO documents "
+            "(sha256, client_id, filename, form_type, ein, ein_key, payer, recipient_last4, indexed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (sha256, client_id, doc.get("filename", ""), form_type, ein, ein_key(ein), payer,
+             recipient_last4, time.time()),
+        )
+        conn.execute("DELETE FROM amounts WHERE sha256=?", (sha256,))
+        conn.executemany(
+            "INSERT INTO amounts (sha256, field, cents) VALUES (?, ?, ?)",
+            [(sha256, k, int(v)) for k, v in amounts.items()],
+        )
+        conn.execute("DELETE FROM doc_text WHERE sha256=?", (sha256,))
+        conn.execute(
+            "INSERT INTO doc_text (sha256, payer, body) VALUES (?, ?, ?)",
+            (sha256, payer or "", mask_ssns(text or "", [recipient])),
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+# ---------------------------
+# Queries
+# ---------------------------
+def _rows(cur) -> List[Dict[str, Any]]:
+    return [dict(r) for r in cur.fetchall()]
+
+
+def _filters(form_type: Optional[str], client_id: Optional[str]):
+    where, args = [], []
+    if form_type:
+        where.append("d.form_type = ?")
+        args.append(form_type)
+    if client_id:
+        where.append("d.client_id = ?")
+        args.append(client_id)
+    return where, args
+
+
+def search(
+    conn: sqlite3.Connection,
+    query: str,
+    form_type: Optional[str] = None,
+    client_id: Optional[str] = None,
+    limit: int = 50,
+    raw: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Full-text search, best matches first, with a text snippet. `query` is
+    searched as a literal phrase ("12-3456789", "Tracy, CA"); with `raw` it
+    is passed through as FTS5 query syntax (AND / OR / NEAR, "phrases",
+    prefix*), and a malformed query raises sqlite3.OperationalError.
+    """
+    if not raw:
+        query = '"' + query.replace('"', '""') + '"'
+    where, args = _filters(form_type, client_id)
+    sql = (
+        "SELECT d.*, snippet(doc_text, 2, '[', ']', '…', 12) AS snippet "
+        "FROM doc_text JOIN documents d ON d.sha256 = doc_text.sha256 "
+        "WHERE doc_text MATCH ?"
+        + "".join(f" AND {w}" for w in where)
+        + " ORDER BY rank LIMIT ?"
+    )
+    return _rows(conn.execute(sql, [query] + args + [limit]))
+
+
+def find_by_ein(
+    conn: sqlite3.Connection,
+    ein: str,
+    form_type: Optional[str] = None,
+    client_id: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Every document from one employer EIN / payer TIN, in any format (12-3456789 or 123456789)."""
+    key = ein_key(ein)
+    if key is None:
+        return []
+    where, args = _filters(form_type, client_id)
+    sql = "SELECT d.* FROM documents d WHERE d.ein_key = ?" + "".join(f" AND {w}" for w in where)
+    return _rows(conn.execute(sql + " ORDER BY d.client_id, d.filename", [key] + args))
+
+
+def find_by_amount(
+    conn: sqlite3.Connection,
+    cents: Cents,
+    field: Optional[str] = None,
+    form_type: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Documents with an amount of exactly `cents` (optionally in one parsed field)."""
+    where, args = _filters(form_type, None)
+    if field:
+        where.append("a.field = ?")
+        args.append(field)
+    sql = (
+        "SELECT d.*, a.field, a.cents FROM amounts a JOIN documents d ON d.sha256 = a.sha256 "
+        "WHERE a.cents = ?" + "".join(f" AND {w}" for w in where)
+    )
+    return _rows(conn.execute(sql, [int(cents)] + args))
+
+
+def get_document(conn: sqlite3.Connection, sha256: str) -> Optional[Dict[str, Any]]:
+    row = conn.execute("SELECT * FROM documents WHERE sha256=?", (sha256,)).fetchone()
+    if row is None:
+        return None
+    out = dict(row)
+    out["amounts"] = {
+        r["field"]: r["cents"] for r in conn.execute("SELECT field, cents FROM amounts WHERE sha256=?", (sha256,))
+    }
+    return out
+
+
+def index_stats(conn: sqlite3.Connection) -> Dict[str, Any]:
+    by_form = {
+        r["form_type"]: r["n"]
+        for r in conn.execute("SELECT form_type, COUNT(*) AS n FROM documents GROUP BY form_type")
+    }
+    clients = conn.execute("SELECT COUNT(DISTINCT client_id) FROM documents").fetchone()[0]
+    return {"documents": sum(by_form.values()), "clients": clients, "by_form_type": by_form}
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+def _print_rows(rows: List[Dict[str, Any]]) -> None:
+    for r in rows:
+        if "cents" in r:
+            r["amount"] = cents_to_dollars(r.pop("cents"))
+        r.pop("indexed_at", None)
+        r.pop("ein_key", None)
+        print(json.dumps(r))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Search extracted document text across clients.")
+    parser.add_argument("db", nargs="?", default=os.environ.get(ENV_VAR), help=f"Index file (default ${ENV_VAR})")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_search = sub.add_parser("search", help="Search for a phrase, e.g. 'first national bank'")
+    p_search.add_argument("query")
+    p_search.add_argument("--raw", action="store_true",
+                          help="Use FTS5 query syntax, e.g. '\"first national\" AND interest'")
+    p_search.add_argument("--form")
+    p_search.add_argument("--client")
+    p_search.add_argument("--limit", type=int, default=50)
+
+    p_ein = sub.add_parser("ein", help="Every document from one employer EIN / payer TIN")
+    p_ein.add_argument("ein")
+    p_ein.add_argument("--form")
+    p_ein.add_argument("--client")
+
+    p_amount = sub.add_parser("amount", help="Documents with an exact amount, e.g. 52,340.18")
+    p_amount.add_argument("amount")
+    p_amount.add_argument("--field")
+    p_amount.add_argument("--form")
+
+    p_doc = sub.add_parser("show", help="One document by SHA-256")
+    p_doc.add_argument("sha256")
+
+    sub.add_parser("stats", help="Document counts")
+
+    args = parser.parse_args(argv)
+    if not args.db:
+        parser.error(f"no index file given and {ENV_VAR} is not set")
+
+    conn = open_text_index(args.db)
+    try:
+        if args.command == "search":
+            try:
+                rows = search(conn, args.query, args.form, args.client, args.limit, raw=args.raw)
+            except sqlite3.OperationalError as e:
+                parser.error(f"bad search query {args.query!r}: {e}")
+            _print_rows(rows)
+        elif args.command == "ein":
+            _print_rows(find_by_ein(conn, args.ein, args.form, args.client))
+        elif args.command == "amount":
+            cents = parse_cents(args.amount)
+            if cents is None:
+                parser.error(f"not an amount: {args.amount}")
+            _print_rows(find_by_amount(conn, cents, args.field, args.form))
+        elif args.command == "show":
+            print(json.dumps(get_document(conn, args.sha256), indent=2))
+        else:
+            print(json.dumps(index_stats(conn), indent=2))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
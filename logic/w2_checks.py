@@ -0,0 +1,64 @@
+# logic/w2_checks.py
+#
+# Cheap cross-field consistency checks for W-2 boxes 1–6.
+#
+# Payroll math makes a correct W-2 internally consistent:
+#   box 4 ≈ 6.2%  × box 3          (Social Security tax)
+#   box 6 ≈ 1.45% × box 5          (Medicare tax; + 0.9% above $200,000)
+#   box 1 ≤ box 5                  (pre-tax deferrals reduce box 1, not box 5)
+# A parse that picked the wrong currency tokens almost never satisfies all of
+# them, so the score is a good signal for when to try a costlier extractor.
+from typing import Any, Dict, List, Optional, Tuple
+
+from logic.money import Cents, apply_rate, parse_cents
+
+SS_RATE_BP = 620
+MEDICARE_RATE_BP = 145
+ADDITIONAL_MEDICARE_RATE_BP = 90
+ADDITIONAL_MEDICARE_THRESHOLD = 200_000_00
+
+# absolute tolerance (cents) and relative tolerance (basis points) for rate checks
+TOLERANCE_CENTS = 100
+TOLERANCE_BP = 50
+
+# score at or above which an extraction is accepted without escalating
+ACCEPT_SCORE = 1.0
+
+
+def _close(actual: Cents, expected: Cents) -> bool:
+    return abs(actual - expected) <= max(TOLERANCE_CENTS, apply_rate(expected, TOLERANCE_BP))
+
+
+def score_w2(first6: List[str]) -> Tuple[float, Dict[str, Optional[bool]]]:
+    """
+    Score boxes 1–6 (as parsed strings, in box order) from 0.0 to 1.0.
+    Returns (score, checks) where each check is True / False, or None when it
+    could not be evaluated.
+    """
+    checks: Dict[str, Optional[bool]] = {
+        "complete": False,
+        "ss_tax_rate": None,
+        "medicare_tax_rate": None,
+        "wages_le_medicare_wages": None,
+    }
+    values = [parse_cents(v) for v in first6[:6]]
+    if len(values) < 6 or any(v is None for v in values):
+        return 0.0, checks
+    checks["complete"] = True
+
+    box1, _, box3, box4, box5, box6 = values
+    checks["ss_tax_rate"] = _close(box4, apply_rate(box3, SS_RATE_BP))
+
+    medicare = apply_rate(box5, MEDICARE_RATE_BP)
+    additional = apply_rate(max(0, box5 - ADDITIONAL_MEDICARE_THRESHOLD), ADDITIONAL_MEDICARE_RATE_BP)
+    checks["medicare_tax_rate"] = _close(box6, medicare) or _close(box6, medicare + additional)
+
+    checks["wages_le_medicare_wages"] = box1 <= box5 + TOLERANCE_CENTS
+
+    passed = sum(1 for v in checks.values() if v)
+    return passed / len(checks), checks
+
+
+def summarize_attempt(method: str, first6: List[str]) -> Dict[str, Any]:
+    score, checks = score_w2(first6)
+    return {"method": method, "score": round(score, 3), "checks": checks, "values": list(first6)}
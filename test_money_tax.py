@@ -0,0 +1,142 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+import pytest
+
+from logic.money import parse_cents
+from logic.tax_2024 import (
+    BRACKETS_2024,
+    compute_tax_summary_cents,
+    income_cents_from_summary,
+    tax_from_brackets_cents,
+)
+from logic.tax_solver import tax_cents, taxable_income_for_tax_cents
+
+STATUSES = sorted(BRACKETS_2024)
+
+
+# ---------------------------
+# parse_cents
+# ---------------------------
+@pytest.mark.parametrize("value, cents", [
+    ("12,345.00", 1234500),
+    ("$1,234.5", 123450),
+    ("$ 1,234.56", 123456),
+    ("(12.00)", -1200),
+    ("($1,000.01)", -100001),
+    ("-5.25", -525),
+    (".75", 75),
+    ("7.", 700),
+    ("1.005", 101),     # third decimal rounds half-up
+    ("1.004", 100),
+    ("0.995", 100),
+    ("2.9999", 300),
+    ("(0.125)", -13),   # rounds away from zero for negatives too
+    (12.5, 1250),
+    (0.1 + 0.2, 30),    # float dollars round on their shortest repr
+    (7, 700),
+])
+def test_parse_cents(value, cents):
+    assert parse_cents(value) == cents
+
+
+@pytest.mark.parametrize("value", ["missing", "", "   ", None, True, float("nan"), "abc", "1.2.3", "$", "()"])
+def test_parse_cents_returns_default(value):
+    assert parse_cents(value) is None
+    assert parse_cents(value, 0) == 0
+
+
+# ---------------------------
+# tax_from_brackets_cents at every bracket edge
+# ---------------------------
+def _reference_tax_cents(taxable_cents: int, status: str) -> int:
+    """Tax straight from the dollar table with Decimal arithmetic."""
+    income = Decimal(taxable_cents) / 100
+    tax, lo = Decimal(0), Decimal(0)
+    for top, rate in BRACKETS_2024[status]:
+        hi = income if top is None else min(income, Decimal(top))
+        if hi > lo:
+            tax += (hi - lo) * Decimal(str(rate))
+        if top is None or income <= top:
+            break
+        lo = Decimal(top)
+    return int((tax * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def _edges():
+    for status in STATUSES:
+        for top, _ in BRACKETS_2024[status]:
+            if top is not None:
+                for delta in (-1, 0, 1):
+                    yield status, top * 100 + delta
+
+
+@pytest.mark.parametrize("status, taxable", list(_edges()))
+def test_tax_at_bracket_edges(status, taxable):
+    expected = _reference_tax_cents(taxable, status)
+    assert tax_from_brackets_cents(taxable, status) == expected
+    assert tax_cents(taxable, status) == expected
+
+
+@pytest.mark.parametrize("taxable, status, tax", [
+    (5, "single", 1),                           # 0.005 → 0.01
+    (15, "single", 2),                          # 0.015 → 0.02
+    (31_247_630, "head_of_household", 7_804_871),   # 78,048.705 → 78,048.71
+])
+def test_tax_rounds_half_cents_up(taxable, status, tax):
+    # The integer-cents engine rounds the exact tax half-up once. The old float
+    # engine could land on either side of a half cent (78,048.70 here).
+    assert tax_from_brackets_cents(taxable, status) == tax
+    assert tax_from_brackets_cents(taxable - 1, status) == tax - 1
+
+
+def test_income_cents_from_summary_maps_parser_keys():
+    summary = {
+        "income": {"w2_wages": 501597, "int_interest": 120000, "nec_nonemployee_comp": 1234500},
+        "withholding": {"federal": 111931},
+    }
+    assert income_cents_from_summary(summary) == {"w2_wages": 501597, "interest": 120000, "nec": 1234500}
+    assert income_cents_from_summary({"income": {"w2_wages": 1}}) == {"w2_wages": 1, "interest": 0, "nec": 0}
+    assert compute_tax_summary_cents(income_cents_from_summary(summary), 111931, "single")["agi"] == 1856097
+
+
+@pytest.mark.parametrize("status", STATUSES)
+def test_tax_is_zero_without_income(status):
+    assert tax_from_brackets_cents(0, status) == 0
+    assert tax_from_brackets_cents(-100, status) == 0
+
+
+# ---------------------------
+# taxable_income_for_tax_cents inverts the tax function
+# ---------------------------
+def _targets(status):
+    targets = {1, 2, 99, 100, 101}
+    for top, _ in BRACKETS_2024[status]:
+        if top is not None:
+            t = tax_from_brackets_cents(top * 100, status)
+            targets.update((t - 1, t, t + 1))
+    targets.update(tax_from_brackets_cents(c, status) for c in (123_456, 9_876_543, 100_000_000_00))
+    return sorted(targets)
+
+
+@pytest.mark.parametrize("status", STATUSES)
+def test_taxable_income_for_tax_is_smallest_income_reaching_target(status):
+    for target in _targets(status):
+        income = taxable_income_for_tax_cents(target, status)
+        assert tax_from_brackets_cents(income, status) >= target
+        assert tax_from_brackets_cents(income - 1, status) < target
+
+
+@pytest.mark.parametrize("status", STATUSES)
+def test_taxable_income_for_tax_round_trips_on_bracket_tops(status):
+    for top, _ in BRACKETS_2024[status]:
+        if top is None:
+            continue
+        income = top * 100
+        found = taxable_income_for_tax_cents(tax_from_brackets_cents(income, status), status)
+        assert found <= income
+        assert tax_from_brackets_cents(found, status) == tax_from_brackets_cents(income, status)
+
+
+def test_taxable_income_for_non_positive_tax_is_zero():
+    assert taxable_income_for_tax_cents(0, "single") == 0
+    assert taxable_income_for_tax_cents(-5, "single") == 0
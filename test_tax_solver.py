@@ -0,0 +1,146 @@
+import random
+
+import pytest
+
+from logic.money import cents_to_dollars
+from logic.tax_2024 import BRACKETS_2024_CENTS, compute_tax_summary_cents, standard_deduction_cents
+from logic.tax_solver import (
+    bracket_headroom_cents,
+    income_for_target_cents,
+    solve,
+    solve_batch_cents,
+    solve_cents,
+    withholding_for_target_cents,
+)
+
+STATUSES = sorted(BRACKETS_2024_CENTS)
+
+
+def _clients(n=2000, seed=40):
+    """Random returns, with targets of none / refund / balance due."""
+    rng = random.Random(seed)
+    for _ in range(n):
+        income = {
+            "w2_wages": rng.choice([0, rng.randrange(0, 30_000_000)]),
+            "interest": rng.choice([0, rng.randrange(0, 1_000_000)]),
+            "nec": rng.choice([0, rng.randrange(0, 20_000_000)]),
+        }
+        target = rng.choice(["none", "refund", "balance_due"])
+        amount = rng.randrange(1, 500_000)
+        yield {
+            "income_cents": income,
+            "withholding_cents": rng.randrange(0, 8_000_000),
+            "filing_status": rng.choice(STATUSES),
+            "target_refund": amount if target == "refund" else 0,
+            "target_balance_due": amount if target == "balance_due" else 0,
+        }
+
+
+CLIENTS = list(_clients())
+
+
+def _outcome(income, withholding, status):
+    """refund − balance due, straight from the tax engine."""
+    s = compute_tax_summary_cents(income, withholding, status)
+    return s["refund"] - s["balance_due"]
+
+
+def _wanted(c):
+    return c["target_refund"] - c["target_balance_due"]
+
+
+@pytest.mark.parametrize("c", CLIENTS[:500])
+def test_withholding_for_target_hits_target(c):
+    out = withholding_for_target_cents(
+        c["income_cents"], c["withholding_cents"], c["filing_status"],
+        c["target_refund"], c["target_balance_due"],
+    )
+    required = out["required_withholding"]
+    assert required >= 0
+    assert out["additional_withholding"] == required - c["withholding_cents"]
+    outcome = _outcome(c["income_cents"], required, c["filing_status"])
+    if required > 0:
+        assert outcome == _wanted(c)
+    else:   # even zero withholding leaves less than the balance due allowed
+        assert outcome >= _wanted(c)
+
+
+def test_income_for_target_is_largest_income_meeting_target():
+    for c in CLIENTS:
+        status, withholding = c["filing_status"], c["withholding_cents"]
+        out = income_for_target_cents(
+            c["income_cents"], withholding, status, c["target_refund"], c["target_balance_due"]
+        )
+        max_agi = out["max_agi"]
+        if max_agi is None:
+            assert withholding - c["target_refund"] + c["target_balance_due"] < 0
+            assert out["additional_income"] is None
+            continue
+        total = sum(c["income_cents"].values())
+        assert out["additional_income"] == max_agi - total
+        assert _outcome({"w2_wages": max_agi}, withholding, status) >= _wanted(c)
+        assert _outcome({"w2_wages": max_agi + 1}, withholding, status) < _wanted(c)
+
+
+@pytest.mark.parametrize("status", STATUSES)
+def test_bracket_headroom_ends_at_bracket_top(status):
+    tops = [top for top, _ in BRACKETS_2024_CENTS[status] if top is not None]
+    std = standard_deduction_cents(status)
+    for taxable in [0, 1] + [t + d for t in tops for d in (-1, 0, 1)] + [tops[-1] * 3]:
+        out = bracket_headroom_cents({"w2_wages": std + taxable}, status)
+        assert out["taxable_income"] == taxable
+        if out["bracket_top"] is None:
+            assert out["headroom"] is None
+            assert taxable > tops[-1]
+            assert out["marginal_rate_bp"] == BRACKETS_2024_CENTS[status][-1][1]
+            continue
+        top = taxable + out["headroom"]
+        assert top == out["bracket_top"] and top in tops
+        lower = [t for t in tops if t < top]
+        assert taxable > (lower[-1] if lower else -1)
+        # one more cent past the top is taxed at the next rate
+        rates = dict(BRACKETS_2024_CENTS[status])
+        assert out["marginal_rate_bp"] == rates[top]
+
+
+def test_targets_are_exclusive():
+    with pytest.raises(ValueError):
+        withholding_for_target_cents({}, 0, "single", target_refund=1, target_balance_due=1)
+    with pytest.raises(ValueError):
+        income_for_target_cents({}, 0, "single", target_refund=1, target_balance_due=1)
+
+
+def test_income_for_target_none_when_withholding_cannot_reach_refund():
+    assert income_for_target_cents({}, 10_000, "single", target_refund=10_001) == {
+        "max_agi": None,
+        "additional_income": None,
+    }
+
+
+def test_solve_batch_matches_solve_cents():
+    batch = CLIENTS[:200]
+    assert solve_batch_cents(batch) == [
+        solve_cents(
+            c["income_cents"], c["withholding_cents"], c["filing_status"],
+            c["target_refund"], c["target_balance_due"],
+        )
+        for c in batch
+    ]
+
+
+def test_solve_dollars_wraps_solve_cents():
+    c = CLIENTS[0]
+    cents = solve_cents(
+        c["income_cents"], c["withholding_cents"], c["filing_status"],
+        c["target_refund"], c["target_balance_due"],
+    )
+    dollars = solve(
+        {k: cents_to_dollars(v) for k, v in c["income_cents"].items()},
+        cents_to_dollars(c["withholding_cents"]),
+        c["filing_status"],
+        cents_to_dollars(c["target_refund"]),
+        cents_to_dollars(c["target_balance_due"]),
+    )
+    assert dollars == {
+        k: v if k == "marginal_rate_bp" or v is None else cents_to_dollars(v) for k, v in cents.items()
+    }
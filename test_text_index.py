@@ -0,0 +1,82 @@
+import sqlite3
+
+import pytest
+
+from logic.text_index import find_by_ein, index_document, mask_ssns, open_text_index, search
+
+
+@pytest.fixture
+def index(tmp_path):
+    conn = open_text_index(str(tmp_path / "index.db"))
+    w2 = {
+        "form_type": "W-2",
+        "filename": "w2.pdf",
+        "parsed_fields": {"b_employer_ein": "12-3456789", "c_employer_name_address_zip": "Cinemark USA"},
+    }
+    index_document(conn, "a" * 64, w2, "Employer 12-3456789 Cinemark USA, Tracy, CA 95376-1234", "client-1")
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize("text, masked", [
+    ("SSN 123-45-6789 wages", "SSN XXX-XX-6789 wages"),
+    ("SSN 123 45 6789 wages", "SSN XXX-XX-6789 wages"),
+])
+def test_mask_ssns_masks_ssn_shapes(text, masked):
+    assert mask_ssns(text) == masked
+
+
+@pytest.mark.parametrize("text", [
+    "Tracy, CA 95376-1234",        # ZIP+4
+    "Tracy, CA 953761234",
+    "EIN 12-3456789",
+    "wages 123456789.00",
+    "wages 123,456,789.00",
+    "$123456789",
+    "account 1234567890",
+    "123-45 6789",                 # mixed separators
+    "123456789",                   # bare digits are only masked when known
+])
+def test_mask_ssns_leaves_other_numbers(text):
+    assert mask_ssns(text) == text
+
+
+def test_mask_ssns_masks_known_recipient_in_any_format():
+    assert mask_ssns("TIN 123456789 and 123.45.6789", ["123456789", "123.45.6789"]) == (
+        "TIN XXX-XX-6789 and XXX-XX-6789"
+    )
+
+
+@pytest.mark.parametrize("query", ["12-3456789", "Tracy, CA", "cinemark usa", 'say "hi'])
+def test_search_treats_query_as_a_phrase(index, query):
+    hits = search(index, query)
+    assert [h["filename"] for h in hits] == ([] if query == 'say "hi' else ["w2.pdf"])
+
+
+def test_search_raw_uses_fts_syntax(index):
+    assert len(search(index, "tracy AND cinemark", raw=True)) == 1
+    with pytest.raises(sqlite3.OperationalError):
+        search(index, "12-3456789", raw=True)
+
+
+@pytest.mark.parametrize("ein", ["12-3456789", "123456789", " 12 3456789 "])
+def test_find_by_ein_ignores_formatting(index, ein):
+    assert [d["filename"] for d in find_by_ein(index, ein)] == ["w2.pdf"]
+    assert find_by_ein(index, ein, form_type="1099-INT") == []
+
+
+def test_find_by_ein_on_index_without_ein_key(tmp_path):
+    path = str(tmp_path / "old.db")
+    old = sqlite3.connect(path)
+    old.executescript(
+        "CREATE TABLE documents (sha256 TEXT PRIMARY KEY, client_id TEXT, filename TEXT NOT NULL, "
+        "form_type TEXT NOT NULL, ein TEXT, payer TEXT, recipient_last4 TEXT, indexed_at REAL NOT NULL);"
+        "CREATE INDEX documents_by_ein ON documents (ein, form_type);"
+        "INSERT INTO documents VALUES ('b', 'c', '1099.pdf', '1099-INT', '98-7654321', NULL, NULL, 0);"
+    )
+    old.close()
+    conn = open_text_index(path)
+    try:
+        assert [d["filename"] for d in find_by_ein(conn, "987654321")] == ["1099.pdf"]
+    finally:
+        conn.close()